@@ -8,6 +8,11 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 from typing import Optional
+from contextlib import asynccontextmanager
+from app.services.http_client import http_clients
+from app.services.registry import services
+from app.services.executor import executors
+from app.services.singleflight import singleflight_stats
 
 # Try to import routers with fallbacks
 try:
@@ -43,10 +48,24 @@ except ImportError:
 # Load environment variables from .env file
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pooled upstream HTTP clients once for the whole process
+    http_clients.start()
+    app.state.http_clients = http_clients
+    # Build the shared service singletons before the first request
+    services.warm()
+    yield
+    # Close keep-alive connections cleanly on shutdown
+    await services.aclose()
+    await http_clients.aclose()
+    executors.shutdown()
+
 # Initialize the FastAPI app
 app = FastAPI(title="OmniBot API", 
              description="An API for OmniBot, a versatile chatbot that integrates multiple services.", 
-             version="1.0.0")
+             version="1.0.0",
+             lifespan=lifespan)
 
 # Set up CORS middleware
 app.add_middleware(
@@ -64,6 +83,11 @@ STATIC_DIR = os.path.join(BASE_DIR, "static")
 # Create static directory if it doesn't exist
 os.makedirs(STATIC_DIR, exist_ok=True)
 
+# Generated images are served with their own caching headers, so their
+# route has to come before the static files mount
+if image_gen:
+    app.include_router(image_gen.generated_router, tags=["Image Generation"])
+
 # Mount static files using a single endpoint
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
@@ -91,6 +115,15 @@ if auth:
 async def health_check():
     return {"status": "ok", "timestamp": time.time()}
 
+# Runtime counters for the shared infrastructure
+@app.get("/api/metrics", tags=["Health"])
+async def metrics():
+    return {
+        "executors": executors.stats(),
+        "singleflight": singleflight_stats(),
+        "services": services.stats()
+    }
+
 # Serve index.html at the root
 @app.get("/", tags=["Frontend"], response_class=HTMLResponse)
 async def serve_homepage():
@@ -1,13 +1,57 @@
 from pydantic import BaseModel, Field, HttpUrl, EmailStr
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Literal, Optional, Dict, Any, Union
 
 class YouTubeRequest(BaseModel):
     url: HttpUrl = Field(..., description="URL of the YouTube video to summarize")
+    max_points: int = Field(3, ge=1, le=10, description="Number of summary points to return")
+    mode: Literal["llm", "fast"] = Field("llm", description="'llm' for an AI summary, 'fast' for key sentences picked locally")
 
 class YouTubeResponse(BaseModel):
     summary: List[str] = Field(..., description="List of summary points about the video")
     title: str = Field(..., description="Title of the video")
     url: HttpUrl = Field(..., description="URL of the video that was summarized")
+    summarizer: str = Field("llm", description="How the summary was made: 'llm' or 'extractive'")
+
+class YouTubeBatchRequest(BaseModel):
+    urls: List[str] = Field(..., min_length=1, max_length=100, description="URLs of the YouTube videos to summarize")
+    max_points: int = Field(3, ge=1, le=10, description="Number of summary points to return per video")
+
+class YouTubeBatchItem(BaseModel):
+    url: str = Field(..., description="URL of the video, as given in the request")
+    video_id: Optional[str] = Field(None, description="YouTube video ID")
+    title: Optional[str] = Field(None, description="Title of the video")
+    summary: Optional[List[str]] = Field(None, description="List of summary points about the video")
+    error: Optional[str] = Field(None, description="Error message, if this video could not be summarized")
+
+class JobResponse(BaseModel):
+    job_id: str = Field(..., description="ID of the background job")
+    status: str = Field(..., description="Job status: queued, running, succeeded or failed")
+    created_at: float = Field(..., description="Unix timestamp when the job was submitted")
+    started_at: Optional[float] = Field(None, description="Unix timestamp when a worker picked up the job")
+    finished_at: Optional[float] = Field(None, description="Unix timestamp when the job finished")
+    result: Optional[Any] = Field(None, description="Job result, once the job has succeeded")
+    error: Optional[str] = Field(None, description="Error message, if the job failed")
+
+class SummaryJobResponse(JobResponse):
+    result: Optional[YouTubeResponse] = Field(None, description="Summary, once the job has succeeded")
+
+class YouTubeQuestionRequest(BaseModel):
+    url: HttpUrl = Field(..., description="URL of the YouTube video to ask about")
+    question: str = Field(..., min_length=1, max_length=500, description="Question about the video")
+    top_k: int = Field(4, ge=1, le=10, description="Number of transcript passages to answer from")
+
+class TranscriptPassage(BaseModel):
+    text: str = Field(..., description="Transcript text of the passage")
+    start: float = Field(..., description="Start of the passage in the video, in seconds")
+    duration: float = Field(..., description="Length of the passage, in seconds")
+    timestamp: str = Field(..., description="Start of the passage as m:ss or h:mm:ss")
+    score: float = Field(..., description="BM25 relevance of the passage to the question")
+
+class YouTubeAnswerResponse(BaseModel):
+    answer: str = Field(..., description="Answer to the question, citing timestamps")
+    question: str = Field(..., description="The question that was asked")
+    url: HttpUrl = Field(..., description="URL of the video")
+    passages: List[TranscriptPassage] = Field(..., description="Transcript passages the answer is based on, in video order")
 
 class WeatherRequest(BaseModel):
     location: str = Field(..., description="Location to get weather for (e.g., 'Tokyo, Japan')")
@@ -44,11 +88,16 @@ class EVStationResponse(BaseModel):
 
 class ImageGenerationRequest(BaseModel):
     prompt: str = Field(..., description="Text prompt for image generation")
+    allow_similar: bool = Field(True, description="Reuse the image of a near-identical earlier prompt instead of generating a new one")
 
 class ImageGenerationResponse(BaseModel):
     image_url: str = Field(..., description="URL of the generated image")
+    thumbnail_url: Optional[str] = Field(None, description="URL of a small version of the image, for generated images we store")
     prompt: str = Field(..., description="Original prompt used to generate the image")
 
+class ImageJobResponse(JobResponse):
+    result: Optional[ImageGenerationResponse] = Field(None, description="Generated image, once the job has succeeded")
+
 class CryptoRequest(BaseModel):
     symbol: str = Field(..., description="Cryptocurrency symbol (e.g., 'BTC', 'ETH')")
 
@@ -63,6 +112,18 @@ class CryptoResponse(BaseModel):
     symbol: str = Field(..., description="Cryptocurrency symbol")
     name: str = Field(..., description="Cryptocurrency name")
 
+class CryptoBatchRequest(BaseModel):
+    symbols: List[str] = Field(..., min_length=1, max_length=50, description="Cryptocurrency symbols (e.g., ['BTC', 'ETH'])")
+
+class CryptoBatchItem(BaseModel):
+    symbol: str = Field(..., description="Cryptocurrency symbol")
+    name: Optional[str] = Field(None, description="Cryptocurrency name")
+    crypto: Optional[CryptoData] = Field(None, description="Price data, absent when the lookup failed")
+    error: Optional[str] = Field(None, description="Why this symbol could not be priced")
+
+class CryptoBatchResponse(BaseModel):
+    results: List[CryptoBatchItem] = Field(..., description="One entry per requested symbol, in request order")
+
 class ErrorResponse(BaseModel):
     error: str = Field(..., description="Error message")
     details: Optional[str] = Field(None, description="Additional error details")
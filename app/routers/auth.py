@@ -2,12 +2,15 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from app.models.schemas import LoginRequest, RegisterRequest, TokenResponse, UserResponse, ErrorResponse
 from app.services.auth_service import AuthService
+from app.services.registry import services
 
 router = APIRouter()
 
+services.register(AuthService)
+
 # Dependency for getting the auth service
 async def get_auth_service():
-    return AuthService()
+    return services.get(AuthService)
 
 # OAuth2 scheme for handling bearer tokens
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
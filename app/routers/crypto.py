@@ -1,12 +1,26 @@
-from fastapi import APIRouter, HTTPException, Depends
-from app.models.schemas import CryptoRequest, CryptoResponse, CryptoData, ErrorResponse
+import json
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from app.models.schemas import CryptoRequest, CryptoResponse, CryptoData, CryptoBatchRequest, CryptoBatchResponse, CryptoBatchItem, ErrorResponse
 from app.services.crypto_service import CryptoService
+from app.services.crypto_ticker import CryptoTicker
+from app.services.registry import services
 
 router = APIRouter()
 
+services.register(CryptoService)
+services.register(CryptoTicker, lambda: CryptoTicker(services.get(CryptoService)))
+
+# Seconds between SSE keep-alive comments when no price changed
+KEEPALIVE_INTERVAL = 15
+
 async def get_crypto_service():
     """Dependency for getting the Cryptocurrency service."""
-    return CryptoService()
+    return services.get(CryptoService)
+
+async def get_crypto_ticker():
+    """Dependency for getting the shared crypto ticker."""
+    return services.get(CryptoTicker)
 
 @router.post(
     "/price", 
@@ -50,4 +64,94 @@ async def get_crypto_price(
         raise HTTPException(
             status_code=500,
             detail=str(e)
-        ) 
\ No newline at end of file
+        )
+
+@router.post(
+    "/prices", 
+    response_model=CryptoBatchResponse,
+    responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}}
+)
+async def get_crypto_prices(
+    request: CryptoBatchRequest,
+    crypto_service: CryptoService = Depends(get_crypto_service)
+):
+    """
+    Get current price and data for several cryptocurrencies in one call.
+    
+    - **symbols**: Cryptocurrency symbols (e.g., ['BTC', 'ETH']), up to 50
+    
+    Returns one entry per symbol; symbols that could not be priced carry an error instead of data.
+    """
+    try:
+        # Validate input
+        symbols = [symbol.strip().upper() for symbol in request.symbols if symbol.strip()]
+        if not symbols:
+            raise ValueError("At least one cryptocurrency symbol is required")
+            
+        # Get cryptocurrency data for every symbol with batched upstream calls
+        results, errors = await crypto_service.get_crypto_prices(symbols)
+        
+        items = []
+        for symbol in dict.fromkeys(symbols):
+            if symbol in results:
+                crypto_data, crypto_name = results[symbol]
+                items.append(CryptoBatchItem(symbol=symbol, name=crypto_name, crypto=CryptoData(**crypto_data)))
+            else:
+                items.append(CryptoBatchItem(symbol=symbol, error=errors.get(symbol, "No price data available")))
+        
+        return CryptoBatchResponse(results=items)
+        
+    except ValueError as e:
+        # Invalid input
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    except Exception as e:
+        # Other errors
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+@router.get(
+    "/stream",
+    responses={400: {"model": ErrorResponse}}
+)
+async def stream_crypto_prices(
+    request: Request,
+    symbols: str = Query(..., description="Comma-separated cryptocurrency symbols (e.g., 'BTC,ETH')"),
+    ticker: CryptoTicker = Depends(get_crypto_ticker)
+):
+    """
+    Stream live prices for a set of cryptocurrencies as Server-Sent Events.
+    
+    - **symbols**: Comma-separated cryptocurrency symbols, up to 50
+    
+    Sends a `price` event with the symbol, name and crypto data whenever a price changes.
+    All clients share one upstream poller per symbol.
+    """
+    requested = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols.split(",") if symbol.strip()))
+    if not requested:
+        raise HTTPException(status_code=400, detail="At least one cryptocurrency symbol is required")
+    if len(requested) > 50:
+        raise HTTPException(status_code=400, detail="At most 50 symbols can be streamed at once")
+    
+    async def event_stream():
+        subscription = ticker.subscribe(requested)
+        try:
+            while not await request.is_disconnected():
+                updates = await subscription.next_updates(timeout=KEEPALIVE_INTERVAL)
+                if not updates:
+                    yield ": keep-alive\n\n"
+                    continue
+                for update in updates.values():
+                    yield f"event: price\ndata: {json.dumps(update)}\n\n"
+        finally:
+            ticker.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,12 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends
 from app.models.schemas import EVStationRequest, EVStationResponse, EVStation, ErrorResponse
 from app.services.ev_service import EVStationService
+from app.services.registry import services
 
 router = APIRouter()
 
+services.register(EVStationService)
+
 async def get_ev_service():
     """Dependency for getting the EV Station service."""
-    return EVStationService()
+    return services.get(EVStationService)
 
 @router.post(
     "/nearby", 
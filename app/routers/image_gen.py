@@ -1,12 +1,42 @@
-from fastapi import APIRouter, HTTPException, Depends
-from app.models.schemas import ImageGenerationRequest, ImageGenerationResponse, ErrorResponse
+import os
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from app.models.schemas import ImageGenerationRequest, ImageGenerationResponse, ImageJobResponse, ErrorResponse
 from app.services.flux_service import FluxService
+from app.services.image_store import ImageStore
+from app.services.image_derivatives import MEDIA_TYPES
+from app.services.image_jobs import ImageJobQueue
+from app.services.prompt_index import PromptIndex
+from app.services.job_queue import QueueFullError, job_response
+from app.services.registry import services
 
 router = APIRouter()
 
+# Serves stored images; mounted at the app root, ahead of the /static files
+generated_router = APIRouter()
+
+services.register(ImageStore)
+services.register(PromptIndex)
+services.register(FluxService)
+services.register(ImageJobQueue)
+
+# Stored images never change, so clients may keep them forever
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+# Until its smaller versions are ready, an image is only cached briefly
+PENDING_CACHE = "public, max-age=60"
+
 async def get_image_service():
     """Dependency for getting the Image Generation service."""
-    return FluxService()
+    return services.get(FluxService)
+
+async def get_image_store():
+    """Dependency for getting the generated image store."""
+    return services.get(ImageStore)
+
+async def get_image_jobs():
+    """Dependency for getting the image generation job queue."""
+    return services.get(ImageJobQueue)
 
 @router.post(
     "/generate", 
@@ -21,6 +51,7 @@ async def generate_image(
     Generate an image based on a text prompt.
     
     - **prompt**: Text prompt describing the image to generate
+    - **allow_similar**: Reuse the image of a near-identical earlier prompt (default: true)
     
     Returns the URL of the generated image.
     """
@@ -30,7 +61,7 @@ async def generate_image(
             raise ValueError("Prompt must be at least 3 characters long")
             
         # Generate the image
-        image_url = await image_service.generate_image(request.prompt)
+        image_url = await image_service.generate_image(request.prompt, allow_similar=request.allow_similar)
         
         if not image_url:
             raise Exception("Failed to generate image")
@@ -38,6 +69,7 @@ async def generate_image(
         # Return the image URL
         return ImageGenerationResponse(
             image_url=image_url,
+            thumbnail_url=image_service.store.thumbnail_url(image_url),
             prompt=request.prompt
         )
         
@@ -52,4 +84,112 @@ async def generate_image(
         raise HTTPException(
             status_code=500,
             detail=str(e)
-        ) 
\ No newline at end of file
+        )
+
+@router.post(
+    "/jobs",
+    response_model=ImageJobResponse,
+    status_code=202,
+    responses={400: {"model": ErrorResponse}, 503: {"model": ErrorResponse}}
+)
+async def submit_image_job(
+    request: ImageGenerationRequest,
+    image_jobs: ImageJobQueue = Depends(get_image_jobs)
+):
+    """
+    Start generating an image in the background.
+    
+    - **prompt**: Text prompt describing the image to generate
+    - **allow_similar**: Reuse the image of a near-identical earlier prompt (default: true)
+    
+    Returns the job right away; poll `/jobs/{job_id}` or subscribe to `/jobs/{job_id}/events`
+    for the image URL. A prompt that is already queued or running returns the existing job.
+    """
+    if not request.prompt or len(request.prompt) < 3:
+        raise HTTPException(status_code=400, detail="Prompt must be at least 3 characters long")
+    
+    try:
+        job, _ = await image_jobs.submit(
+            {"prompt": request.prompt, "allow_similar": request.allow_similar},
+            dedupe_key=image_jobs.dedupe_key(request.prompt, request.allow_similar)
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    
+    return job_response(job, ImageJobResponse)
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=ImageJobResponse,
+    responses={404: {"model": ErrorResponse}}
+)
+async def get_image_job(
+    job_id: str,
+    image_jobs: ImageJobQueue = Depends(get_image_jobs)
+):
+    """
+    Get the status of an image generation job, and the image URL once it has succeeded.
+    """
+    job = await image_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job, ImageJobResponse)
+
+@router.get(
+    "/jobs/{job_id}/events",
+    responses={404: {"model": ErrorResponse}}
+)
+async def stream_image_job(
+    job_id: str,
+    request: Request,
+    image_jobs: ImageJobQueue = Depends(get_image_jobs)
+):
+    """
+    Follow an image generation job as Server-Sent Events.
+    
+    Sends a `status` event with the job on every status change; the stream ends
+    once the job has succeeded or failed.
+    """
+    if await image_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return StreamingResponse(
+        image_jobs.events(job_id, ImageJobResponse, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@generated_router.get("/static/generated/{name}.png", include_in_schema=False)
+async def serve_generated_image(
+    name: str,
+    request: Request,
+    image_store: ImageStore = Depends(get_image_store)
+):
+    """
+    Serve a generated image by the hash of its content, or its thumbnail
+    as `<hash>-thumb.png`.
+    
+    The image is sent as AVIF or WebP when the client's Accept header allows
+    and that version is ready, as PNG otherwise. Every version has its own
+    strong ETag, so revalidation is answered with 304 Not Modified without
+    reading the file.
+    """
+    digest, thumbnail = (name[:-len("-thumb")], True) if name.endswith("-thumb") else (name, False)
+    if not image_store.exists(digest):
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    # Older images get their smaller versions made in the background
+    ready = image_store.has_derivatives(digest)
+    if not ready:
+        image_store.derive(digest)
+    
+    filename, fmt = image_store.choose(digest, request.headers.get("accept", ""), thumbnail)
+    etag = f'"{filename}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE if ready else PENDING_CACHE, "Vary": "Accept"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        os.path.join(image_store.directory, filename),
+        media_type=MEDIA_TYPES[fmt],
+        headers=headers
+    )
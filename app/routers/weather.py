@@ -1,18 +1,21 @@
 from fastapi import APIRouter, HTTPException, Depends
 from app.models.schemas import WeatherRequest, WeatherResponse, WeatherData, ErrorResponse
 from app.services.weather_service import WeatherService
+from app.services.registry import services
 import logging
 import traceback
 
 router = APIRouter()
 
+services.register(WeatherService)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 async def get_weather_service():
     """Dependency for getting the Weather service."""
-    return WeatherService()
+    return services.get(WeatherService)
 
 @router.post(
     "/current", 
@@ -1,17 +1,42 @@
-from fastapi import APIRouter, HTTPException, Depends
-from app.models.schemas import YouTubeRequest, YouTubeResponse, ErrorResponse
+import json
+import logging
+from typing import Literal
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from app.models.schemas import YouTubeRequest, YouTubeResponse, YouTubeBatchRequest, YouTubeBatchItem, SummaryJobResponse, YouTubeQuestionRequest, YouTubeAnswerResponse, ErrorResponse
 from app.services.youtube_service import YouTubeService
-from app.services.gemini_service import GeminiService
+from app.services.llm_router import LLMRouter
+from app.services.summary_service import SummaryService
+from app.services.summary_jobs import SummaryJobQueue
+from app.services.transcript_qa import TranscriptQAService
+from app.services.job_queue import QueueFullError, job_response
+from app.services.registry import services
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+services.register(YouTubeService)
+services.register(LLMRouter)
+services.register(SummaryService)
+services.register(SummaryJobQueue)
+services.register(TranscriptQAService)
+
 async def get_youtube_service():
     """Dependency for getting the YouTube service."""
-    return YouTubeService()
+    return services.get(YouTubeService)
+
+async def get_summary_service():
+    """Dependency for getting the cached video summary service."""
+    return services.get(SummaryService)
 
-async def get_gemini_service():
-    """Dependency for getting the Gemini service."""
-    return GeminiService()
+async def get_summary_jobs():
+    """Dependency for getting the summarization job queue."""
+    return services.get(SummaryJobQueue)
+
+async def get_transcript_qa():
+    """Dependency for getting the transcript question answering service."""
+    return services.get(TranscriptQAService)
 
 @router.post(
     "/summarize", 
@@ -21,33 +46,33 @@ async def get_gemini_service():
 async def summarize_youtube_video(
     request: YouTubeRequest,
     youtube_service: YouTubeService = Depends(get_youtube_service),
-    gemini_service: GeminiService = Depends(get_gemini_service)
+    summary_service: SummaryService = Depends(get_summary_service)
 ):
     """
     Summarize a YouTube video by its URL.
     
     - **url**: The URL of the YouTube video to summarize
+    - **max_points**: Number of summary points (default: 3)
+    - **mode**: "llm" (default) or "fast" for key sentences picked locally, without an LLM
     
-    Returns a summary of the video content.
+    Returns a summary of the video content. Summaries are cached per video, model and prompt.
+    When the LLM fails or takes longer than its deadline, key sentences are returned instead.
     """
     try:
         # Extract video ID from URL
         video_id = await youtube_service.extract_video_id(str(request.url))
         
-        # Get video title
-        title = await youtube_service.get_video_title(video_id)
-        
-        # Get transcript
-        transcript, _ = await youtube_service.get_transcript(video_id)
-        
-        # Summarize the transcript
-        summary_points = await gemini_service.summarize_text(transcript)
+        # Get title and summary, from the cache when possible
+        title, summary_points, summarizer = await summary_service.summarize_video(
+            video_id, request.max_points, mode=request.mode, deadline=summary_service.llm_deadline
+        )
         
         # Return the summarized data
         return YouTubeResponse(
             summary=summary_points,
             title=title,
-            url=request.url
+            url=request.url,
+            summarizer=summarizer
         )
         
     except ValueError as e:
@@ -61,4 +86,195 @@ async def summarize_youtube_video(
         raise HTTPException(
             status_code=500,
             detail=str(e)
-        ) 
\ No newline at end of file
+        ) 
+
+@router.post(
+    "/summarize/batch",
+    responses={200: {"content": {"application/x-ndjson": {}}}}
+)
+async def summarize_youtube_batch(
+    request: YouTubeBatchRequest,
+    youtube_service: YouTubeService = Depends(get_youtube_service),
+    summary_service: SummaryService = Depends(get_summary_service)
+):
+    """
+    Summarize many YouTube videos, streaming one JSON line per video as it finishes.
+    
+    - **urls**: URLs of the videos to summarize, up to 100
+    - **max_points**: Number of summary points per video (default: 3)
+    
+    URLs pointing at the same video are summarized once. Each line has the url, video_id,
+    title and summary, or an error for videos that failed. Results arrive in completion order.
+    """
+    invalid = []
+    video_urls = {}
+    for url in request.urls:
+        try:
+            video_id = await youtube_service.extract_video_id(url)
+        except ValueError as e:
+            invalid.append(YouTubeBatchItem(url=url, error=str(e)))
+            continue
+        video_urls.setdefault(video_id, url)
+    
+    async def result_stream():
+        for item in invalid:
+            yield item.model_dump_json() + "\n"
+        async for video_id, result, error in summary_service.summarize_many(list(video_urls), request.max_points):
+            item = YouTubeBatchItem(url=video_urls[video_id], video_id=video_id, error=error)
+            if result is not None:
+                item.title, item.summary = result
+            yield item.model_dump_json() + "\n"
+    
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+@router.get(
+    "/summarize/stream",
+    responses={400: {"model": ErrorResponse}}
+)
+async def stream_youtube_summary(
+    url: str = Query(..., description="URL of the YouTube video to summarize"),
+    max_points: int = Query(3, ge=1, le=10, description="Number of summary points to return"),
+    mode: Literal["llm", "fast"] = Query("llm", description="'llm' for an AI summary, 'fast' for key sentences picked locally"),
+    youtube_service: YouTubeService = Depends(get_youtube_service),
+    summary_service: SummaryService = Depends(get_summary_service)
+):
+    """
+    Summarize a YouTube video, streaming the result as Server-Sent Events.
+    
+    - **url**: The URL of the YouTube video to summarize
+    - **max_points**: Number of summary points (default: 3)
+    - **mode**: "llm" (default) or "fast" for key sentences picked locally
+    
+    Sends a `title` event first, a `point` event for each summary point as the model
+    produces it, and a final `done` event. Failures after the stream has started are
+    sent as an `error` event.
+    """
+    try:
+        video_id = await youtube_service.extract_video_id(url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def event_stream():
+        try:
+            async for event, data in summary_service.stream_video(video_id, max_points, mode):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming summary for {video_id}: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post(
+    "/ask",
+    response_model=YouTubeAnswerResponse,
+    responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}}
+)
+async def ask_youtube_video(
+    request: YouTubeQuestionRequest,
+    youtube_service: YouTubeService = Depends(get_youtube_service),
+    transcript_qa: TranscriptQAService = Depends(get_transcript_qa)
+):
+    """
+    Answer a question about a YouTube video from its transcript.
+    
+    - **url**: The URL of the YouTube video
+    - **question**: The question to answer
+    - **top_k**: Number of transcript passages to answer from (default: 4)
+    
+    Only the transcript passages that best match the question are sent to the model.
+    The answer cites their timestamps, and the passages are returned with it.
+    """
+    try:
+        video_id = await youtube_service.extract_video_id(str(request.url))
+        answer, passages = await transcript_qa.ask(video_id, request.question, request.top_k)
+        return YouTubeAnswerResponse(
+            answer=answer,
+            question=request.question,
+            url=request.url,
+            passages=passages
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error answering question about {request.url}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post(
+    "/jobs",
+    response_model=SummaryJobResponse,
+    status_code=202,
+    responses={400: {"model": ErrorResponse}, 503: {"model": ErrorResponse}}
+)
+async def submit_summary_job(
+    request: YouTubeRequest,
+    youtube_service: YouTubeService = Depends(get_youtube_service),
+    summary_jobs: SummaryJobQueue = Depends(get_summary_jobs)
+):
+    """
+    Start summarizing a YouTube video in the background.
+    
+    - **url**: The URL of the YouTube video to summarize
+    - **max_points**: Number of summary points (default: 3)
+    
+    Returns the job right away; poll `/jobs/{job_id}` or subscribe to `/jobs/{job_id}/events`
+    for the result. A video that is already queued or running returns the existing job.
+    """
+    try:
+        video_id = await youtube_service.extract_video_id(str(request.url))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        job, _ = await summary_jobs.submit(
+            {"video_id": video_id, "max_points": request.max_points, "mode": request.mode, "url": str(request.url)},
+            dedupe_key=summary_jobs.dedupe_key(video_id, request.max_points, request.mode)
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    
+    return job_response(job, SummaryJobResponse)
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=SummaryJobResponse,
+    responses={404: {"model": ErrorResponse}}
+)
+async def get_summary_job(
+    job_id: str,
+    summary_jobs: SummaryJobQueue = Depends(get_summary_jobs)
+):
+    """
+    Get the status of a summarization job, and its result once it has succeeded.
+    """
+    job = await summary_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job, SummaryJobResponse)
+
+@router.get(
+    "/jobs/{job_id}/events",
+    responses={404: {"model": ErrorResponse}}
+)
+async def stream_summary_job(
+    job_id: str,
+    request: Request,
+    summary_jobs: SummaryJobQueue = Depends(get_summary_jobs)
+):
+    """
+    Follow a summarization job as Server-Sent Events.
+    
+    Sends a `status` event with the job on every status change; the stream ends
+    once the job has succeeded or failed.
+    """
+    if await summary_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return StreamingResponse(
+        summary_jobs.events(job_id, SummaryJobResponse, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
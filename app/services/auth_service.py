@@ -2,6 +2,7 @@ import os
 import json
 import time
 import jwt
+import threading
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
 from typing import Optional, Dict, Any
@@ -21,6 +22,9 @@ class AuthService:
         self.algorithm = "HS256"
         self.access_token_expire_minutes = 60 * 24  # 1 day
         
+        # Guards self.users and the users file; this service is shared by all requests
+        self._lock = threading.Lock()
+        
         # Initialize users from file or create empty dict
         self.users = self._load_users()
         
@@ -64,7 +68,7 @@ class AuthService:
     
     def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Get a user by email."""
-        for user_id, user in self.users.items():
+        for user_id, user in list(self.users.items()):
             if user["email"] == email:
                 return user
         return None
@@ -96,22 +100,28 @@ class AuthService:
     
     def register_user(self, name: str, email: str, password: str) -> Optional[Dict[str, Any]]:
         """Register a new user."""
-        # Check if user with this email already exists
-        if self.get_user_by_email(email):
-            return None
-        
-        # Create a new user
-        user_id = str(int(time.time()))
-        new_user = {
-            "id": user_id,
-            "email": email,
-            "name": name,
-            "hashed_password": self.get_password_hash(password)
-        }
+        # Hash outside the lock, it is the slow part
+        hashed_password = self.get_password_hash(password)
         
-        # Add user to dict and save
-        self.users[user_id] = new_user
-        self._save_users(self.users)
+        with self._lock:
+            # Check if user with this email already exists
+            if self.get_user_by_email(email):
+                return None
+            
+            # Create a new user
+            user_id = str(int(time.time()))
+            while user_id in self.users:
+                user_id = str(int(user_id) + 1)
+            new_user = {
+                "id": user_id,
+                "email": email,
+                "name": name,
+                "hashed_password": hashed_password
+            }
+            
+            # Add user to dict and save
+            self.users[user_id] = new_user
+            self._save_users(self.users)
         
         # Return user without password
         user_data = new_user.copy()
@@ -0,0 +1,232 @@
+"""
+Caching building blocks shared by the services.
+
+- `TTLCache`: in-memory LRU with per-entry expiry.
+- `SQLiteCache`: persistent key/value table with expiry, used as a
+  write-through layer so cached results survive restarts and serverless
+  cold starts. If the database cannot be opened (read-only filesystem,
+  corrupt file) it disables itself and callers fall back to memory only.
+- `connect_sqlite`: opens the SQLite file of a persistent store, shared by
+  `SQLiteCache` and the other stores built the same way.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+
+
+def data_dir() -> str:
+    """
+    Directory for local cache files.
+
+    Uses OMNIBOT_DATA_DIR when set, otherwise `data/` at the project root.
+    Falls back to the system temp directory when that is not writable, as on
+    serverless platforms where only /tmp can be written.
+    """
+    directory = os.getenv("OMNIBOT_DATA_DIR", os.path.join(BASE_DIR, "data"))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        if os.access(directory, os.W_OK):
+            return directory
+    except OSError:
+        pass
+    directory = os.path.join(tempfile.gettempdir(), "omnibot")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def data_path(filename: str) -> str:
+    """Path of a file inside the cache data directory."""
+    return os.path.join(data_dir(), filename)
+
+
+def connect_sqlite(path: str, schema: Sequence[str], name: str) -> Optional[sqlite3.Connection]:
+    """
+    Open the SQLite file of a persistent store, in WAL mode.
+
+    Args:
+        path: Database file; its directory is created when missing
+        schema: Statements creating the store's tables and indexes if needed
+        name: What the store is, for the warning logged when it cannot be used
+
+    Returns:
+        The connection, usable from any thread under the caller's lock, or
+        None when the file cannot be opened (the caller should disable itself)
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in schema:
+            conn.execute(statement)
+        conn.commit()
+        return conn
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Disabling {name} {path}: {str(e)}")
+        return None
+
+
+class TTLCache:
+    """Thread-safe in-memory LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a value, or None when it is missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entries when full."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteCache:
+    """Persistent key/value store with per-entry expiry, backed by one SQLite table."""
+
+    def __init__(self, path: str, table: str):
+        if not re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", table):
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = path
+        self.table = table
+        self.enabled = True
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None or not self.enabled:
+            return self._conn
+        self._conn = connect_sqlite(self.path, [
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        ], "persistent cache")
+        self.enabled = self._conn is not None
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        """
+        Look up a key.
+
+        Returns:
+            Tuple of (value, expiry timestamp) or None when missing or expired
+        """
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache read failed for {self.table}: {str(e)}")
+                return None
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return json.loads(value), expires_at
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a JSON-serializable value, optionally expiring after `ttl` seconds."""
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at),
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache write failed for {self.table}: {str(e)}")
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache delete failed for {self.table}: {str(e)}")
+
+    def purge_expired(self) -> int:
+        """Delete expired rows and return how many were removed."""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return 0
+            try:
+                cursor = conn.execute(
+                    f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+                )
+                conn.commit()
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                logger.warning(f"Cache purge failed for {self.table}: {str(e)}")
+                return 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,144 @@
+"""
+In-memory OHLCV candle store.
+
+Each symbol keeps a fixed-size ring buffer of candles in parallel
+`array('d')` columns (timestamp, open, high, low, close, volume), filled
+from raw bar JSON. Window statistics such as the 24h change and volume are
+computed straight from the buffers, with no DataFrame involved, and later
+queries only need to fetch the bars newer than the ones already held.
+"""
+import threading
+from array import array
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+Candle = Tuple[float, float, float, float, float, float]
+
+
+class CandleSeries:
+    """Ring buffer of candles for one symbol, oldest to newest."""
+
+    def __init__(self, capacity: int = 48):
+        self.capacity = capacity
+        self.timestamps = array("d", [0.0] * capacity)
+        self.opens = array("d", [0.0] * capacity)
+        self.highs = array("d", [0.0] * capacity)
+        self.lows = array("d", [0.0] * capacity)
+        self.closes = array("d", [0.0] * capacity)
+        self.volumes = array("d", [0.0] * capacity)
+        self._start = 0
+        self.count = 0
+
+    def _index(self, position: int) -> int:
+        return (self._start + position) % self.capacity
+
+    @property
+    def last_timestamp(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        return self.timestamps[self._index(self.count - 1)]
+
+    def append(self, timestamp: float, open_: float, high: float, low: float, close: float, volume: float) -> None:
+        """
+        Add a candle.
+
+        A candle with the same timestamp as the newest one replaces it (the
+        current bar is still forming); older candles are ignored.
+        """
+        last = self.last_timestamp
+        if last is not None and timestamp < last:
+            return
+        if last is not None and timestamp == last:
+            index = self._index(self.count - 1)
+        elif self.count < self.capacity:
+            index = self._index(self.count)
+            self.count += 1
+        else:
+            # Full: overwrite the oldest candle
+            index = self._start
+            self._start = (self._start + 1) % self.capacity
+
+        self.timestamps[index] = timestamp
+        self.opens[index] = open_
+        self.highs[index] = high
+        self.lows[index] = low
+        self.closes[index] = close
+        self.volumes[index] = volume
+
+    def since(self, timestamp: float) -> Iterator[Candle]:
+        """Candles with a timestamp at or after `timestamp`, oldest first."""
+        for position in range(self.count):
+            index = self._index(position)
+            if self.timestamps[index] >= timestamp:
+                yield (
+                    self.timestamps[index],
+                    self.opens[index],
+                    self.highs[index],
+                    self.lows[index],
+                    self.closes[index],
+                    self.volumes[index],
+                )
+
+    def window_stats(self, since: float, last_price: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Statistics over the candles starting at `since`.
+
+        Args:
+            since: Window start (Unix timestamp)
+            last_price: Latest trade price, used as the close when given
+
+        Returns:
+            Dict with open, close, high, low, volume (base units),
+            quote_volume (volume x close) and change_pct, or None when the
+            window holds no candles
+        """
+        open_price = None
+        close = high = low = 0.0
+        volume = quote_volume = 0.0
+        for _, o, h, l, c, v in self.since(since):
+            if open_price is None:
+                open_price = o
+                high = h
+                low = l
+            high = max(high, h)
+            low = min(low, l)
+            close = c
+            volume += v
+            quote_volume += v * c
+
+        if open_price is None:
+            return None
+        if last_price is not None:
+            close = last_price
+        change_pct = ((close - open_price) / open_price) * 100 if open_price else 0.0
+        return {
+            "open": open_price,
+            "close": close,
+            "high": high,
+            "low": low,
+            "volume": volume,
+            "quote_volume": quote_volume,
+            "change_pct": change_pct,
+        }
+
+
+class CandleStore:
+    """Candle series keyed by symbol."""
+
+    def __init__(self, capacity: int = 48):
+        self.capacity = capacity
+        self._series: Dict[str, CandleSeries] = {}
+        self._lock = threading.Lock()
+
+    def series(self, symbol: str) -> CandleSeries:
+        with self._lock:
+            series = self._series.get(symbol)
+            if series is None:
+                series = CandleSeries(self.capacity)
+                self._series[symbol] = series
+            return series
+
+    def get(self, symbol: str) -> Optional[CandleSeries]:
+        return self._series.get(symbol)
+
+    def __len__(self) -> int:
+        return len(self._series)
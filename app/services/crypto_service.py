@@ -1,13 +1,45 @@
 import os
-import alpaca_trade_api as tradeapi
-from typing import Dict, Any, Tuple
-import httpx
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Tuple, Optional
+from app.services.http_client import HTTPClientManager, http_clients as default_http_clients
+from app.services.singleflight import SingleFlight
+from app.services.candle_store import CandleStore
+
+# CoinGecko requires IDs instead of symbols
+COINGECKO_IDS = {
+    "BTC": "bitcoin",
+    "ETH": "ethereum",
+    "SOL": "solana",
+    "ADA": "cardano",
+    "DOT": "polkadot",
+    "DOGE": "dogecoin",
+    "SHIB": "shiba-inu",
+    "AVAX": "avalanche-2",
+    "MATIC": "matic-network",
+    "LTC": "litecoin"
+}
+
+def _parse_timestamp(value: str) -> float:
+    """Parse an RFC 3339 timestamp from Alpaca (possibly with nanoseconds) to a Unix timestamp."""
+    value = value.replace("Z", "+00:00")
+    if "." in value:
+        head, _, tail = value.partition(".")
+        digits = tail[:len(tail) - 6] if tail.endswith("+00:00") else tail
+        value = f"{head}.{digits[:6]}+00:00"
+    return datetime.fromisoformat(value).timestamp()
 
 class CryptoService:
-    def __init__(self):
+    def __init__(self, http_clients: Optional[HTTPClientManager] = None):
+        self.http_clients = http_clients or default_http_clients
         self.api_key = os.getenv("ALPACA_API_KEY")
         self.api_secret = os.getenv("ALPACA_API_SECRET")
-        self.alpaca = tradeapi.REST(self.api_key, self.api_secret, base_url='https://paper-api.alpaca.markets')
+        
+        # Hourly candles per pair, filled incrementally from Alpaca bar data
+        self.candles = CandleStore(capacity=int(os.getenv("CRYPTO_CANDLE_CAPACITY", 48)))
+        
+        # Concurrent requests for the same symbol share one upstream lookup
+        self.lookups = SingleFlight("crypto")
         
         # Crypto symbol mappings (symbol -> name)
         self.crypto_names = {
@@ -39,134 +71,238 @@ class CryptoService:
         # Normalize symbol to uppercase
         symbol = symbol.upper()
         
-        # Add USD suffix for Alpaca API
-        alpaca_symbol = f"{symbol}USD"
+        crypto_data, crypto_name = await self.lookups.do(("price", symbol), lambda: self._get_crypto_price(symbol))
+        return dict(crypto_data), crypto_name
+    
+    async def get_crypto_prices(self, symbols: List[str]) -> Tuple[Dict[str, Tuple[Dict[str, Any], str]], Dict[str, str]]:
+        """
+        Get current price and data for several cryptocurrencies at once.
         
-        try:
-            # Try to get data from Alpaca API
-            crypto_data = self._get_from_alpaca(alpaca_symbol)
-            
-            # Get cryptocurrency name
-            crypto_name = self.crypto_names.get(symbol, f"{symbol} Cryptocurrency")
-            
-            return crypto_data, crypto_name
+        Symbols are resolved with one batched Alpaca call, and whatever Alpaca
+        cannot price is resolved with one batched CoinGecko call.
+        
+        Args:
+            symbols: Cryptocurrency symbols (e.g., ["BTC", "ETH"])
             
+        Returns:
+            Tuple of (symbol -> (crypto data dict, name) for every resolved
+            symbol, symbol -> error message for every failed one)
+        """
+        # Normalize and deduplicate, keeping the caller's order
+        normalized = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol.strip()))
+        
+        results, errors = await self.lookups.do(
+            ("prices", tuple(sorted(normalized))),
+            lambda: self._get_crypto_prices(normalized)
+        )
+        return {symbol: (dict(data), name) for symbol, (data, name) in results.items()}, dict(errors)
+    
+    async def _get_crypto_price(self, symbol: str) -> Tuple[Dict[str, Any], str]:
+        """Look up a normalized symbol on Alpaca, then CoinGecko, then mock data."""
+        results, errors = await self._get_crypto_prices([symbol])
+        
+        if symbol in results:
+            return results[symbol]
+        
+        # If both APIs fail, return mock data for demo purposes
+        print(f"Crypto price error for {symbol}: {errors.get(symbol)}")
+        return self._get_mock_data(symbol), self.crypto_names.get(symbol, f"{symbol} Cryptocurrency")
+    
+    async def _get_crypto_prices(self, symbols: List[str]) -> Tuple[Dict[str, Tuple[Dict[str, Any], str]], Dict[str, str]]:
+        """Resolve normalized symbols on Alpaca first, then CoinGecko for the rest."""
+        results: Dict[str, Tuple[Dict[str, Any], str]] = {}
+        errors: Dict[str, str] = {}
+        
+        try:
+            # Batched Alpaca calls
+            alpaca_data = await self._get_from_alpaca(symbols)
+            for symbol, crypto_data in alpaca_data.items():
+                results[symbol] = (crypto_data, self.crypto_names.get(symbol, f"{symbol} Cryptocurrency"))
         except Exception as e:
             print(f"Alpaca API error: {str(e)}")
-            
-            # Fallback to using CoinGecko API
+        
+        remaining = [symbol for symbol in symbols if symbol not in results]
+        if remaining:
+            # Fallback to one batched CoinGecko call
             try:
-                return await self._get_from_coingecko(symbol)
-            except Exception as e2:
-                print(f"CoinGecko API error: {str(e2)}")
-                
-                # If both APIs fail, return mock data for demo purposes
-                return self._get_mock_data(symbol), self.crypto_names.get(symbol, f"{symbol} Cryptocurrency")
+                coingecko_data = await self._get_from_coingecko(remaining)
+                results.update(coingecko_data)
+            except Exception as e:
+                print(f"CoinGecko API error: {str(e)}")
+                for symbol in remaining:
+                    errors[symbol] = str(e)
+            
+            for symbol in remaining:
+                if symbol not in results and symbol not in errors:
+                    errors[symbol] = f"No price data available for {symbol}"
+        
+        return results, errors
     
-    def _get_from_alpaca(self, symbol: str) -> Dict[str, Any]:
+    async def _get_from_alpaca(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
         """
-        Get cryptocurrency data from Alpaca API.
+        Get cryptocurrency data for several symbols from Alpaca's market data API.
+        
+        Latest trades come from one batched call. Hourly bars are added to the
+        in-memory candle store, fetching only bars newer than those already
+        held, and the 24h statistics are computed from the stored candles.
         
         Args:
-            symbol: Cryptocurrency symbol with USD suffix
+            symbols: Cryptocurrency symbols without the USD suffix
             
         Returns:
-            Crypto data dictionary
+            Symbol -> crypto data dictionary, for the symbols Alpaca could price
             
         Raises:
             Exception: If API call fails
         """
         try:
-            # Get last trade data
-            trade = self.alpaca.get_latest_crypto_trade(symbol)
+            pairs = {f"{symbol}/USD": symbol for symbol in symbols}
             
-            # Get 24h bar data
-            bars = self.alpaca.get_crypto_bars(symbol, "1Day").df
+            # Get last trade data for every pair in one call
+            data = await self._alpaca_get("/v1beta3/crypto/us/latest/trades", {"symbols": ",".join(pairs)})
+            trades = data.get("trades") or {}
             
-            if len(bars) == 0:
-                raise Exception("No bar data available")
+            # Bring the candle store up to date for every pair
+            await self._update_candles(list(pairs))
+            
+            since = time.time() - 24 * 3600
+            results = {}
+            for pair, symbol in pairs.items():
+                trade = trades.get(pair)
+                series = self.candles.get(pair)
+                if trade is None or series is None:
+                    continue
+                stats = series.window_stats(since, last_price=trade["p"])
+                if stats is None:
+                    continue
+                    
+                results[symbol] = {
+                    "price": trade["p"],
+                    "change_24h": stats["change_pct"],
+                    "market_cap": self._estimate_market_cap(symbol, trade["p"]),
+                    # 24h volume from bar data, converted to USD
+                    "volume_24h": stats["quote_volume"]
+                }
                 
-            # Calculate 24h change percentage
-            open_price = bars.iloc[0]['open']
-            close_price = bars.iloc[-1]['close']
-            change_24h = ((close_price - open_price) / open_price) * 100
-            
-            # Market cap is not directly available from Alpaca
-            # This is a placeholder calculation (not accurate)
-            # In a real app, you would get this from another API
-            if symbol.startswith("BTC"):
-                market_cap = trade.price * 19_000_000  # ~19M BTC in circulation
-            elif symbol.startswith("ETH"):
-                market_cap = trade.price * 120_000_000  # ~120M ETH in circulation
-            else:
-                market_cap = trade.price * 1_000_000_000  # Placeholder
-            
-            # 24h volume from bar data
-            volume_24h = bars['volume'].sum()
-            
-            return {
-                "price": trade.price,
-                "change_24h": change_24h,
-                "market_cap": market_cap,
-                "volume_24h": volume_24h
-            }
+            return results
             
         except Exception as e:
             raise Exception(f"Error retrieving data from Alpaca: {str(e)}")
     
-    async def _get_from_coingecko(self, symbol: str) -> Tuple[Dict[str, Any], str]:
+    async def _update_candles(self, pairs: List[str]) -> None:
+        """Fetch hourly bars newer than the ones held for each pair into the candle store."""
+        now = time.time()
+        window_start = now - 24 * 3600
+        
+        # Refetch from the newest held bar (it may still be forming), or the last 24h
+        starts = []
+        for pair in pairs:
+            series = self.candles.get(pair)
+            last = series.last_timestamp if series is not None else None
+            starts.append(last if last is not None and last >= window_start else window_start)
+        start = datetime.fromtimestamp(min(starts), tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        
+        params = {
+            "symbols": ",".join(pairs),
+            "timeframe": "1Hour",
+            "start": start,
+            "limit": 10000
+        }
+        while True:
+            data = await self._alpaca_get("/v1beta3/crypto/us/bars", params)
+            for pair, bars in (data.get("bars") or {}).items():
+                series = self.candles.series(pair)
+                for bar in bars:
+                    series.append(_parse_timestamp(bar["t"]), bar["o"], bar["h"], bar["l"], bar["c"], bar["v"])
+            
+            next_page_token = data.get("next_page_token")
+            if not next_page_token:
+                break
+            params["page_token"] = next_page_token
+    
+    async def _alpaca_get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """GET a market data endpoint and return its JSON body."""
+        headers = {}
+        if self.api_key and self.api_secret:
+            headers = {"APCA-API-KEY-ID": self.api_key, "APCA-API-SECRET-KEY": self.api_secret}
+        
+        client = self.http_clients.get("alpaca")
+        response = await client.get(path, params=params, headers=headers)
+        
+        if response.status_code != 200:
+            raise Exception(f"Alpaca API error: {response.status_code} - {response.text}")
+            
+        return response.json()
+    
+    def _estimate_market_cap(self, symbol: str, price: float) -> float:
+        """
+        Estimate market cap from the price.
+        
+        Market cap is not directly available from Alpaca.
+        This is a placeholder calculation (not accurate).
+        In a real app, you would get this from another API.
         """
-        Get cryptocurrency data from CoinGecko API.
+        if symbol == "BTC":
+            return price * 19_000_000  # ~19M BTC in circulation
+        elif symbol == "ETH":
+            return price * 120_000_000  # ~120M ETH in circulation
+        else:
+            return price * 1_000_000_000  # Placeholder
+    
+    async def _get_from_coingecko(self, symbols: List[str]) -> Dict[str, Tuple[Dict[str, Any], str]]:
+        """
+        Get cryptocurrency data for several symbols from CoinGecko API.
+        
+        Uses the compact /simple/price endpoint, which returns exactly the
+        four fields we need for every coin in one response.
         
         Args:
-            symbol: Cryptocurrency symbol
+            symbols: Cryptocurrency symbols
             
         Returns:
-            Tuple of (crypto data dict, cryptocurrency name)
+            Symbol -> (crypto data dict, cryptocurrency name), for the symbols
+            CoinGecko could price
             
         Raises:
             Exception: If API call fails
         """
         # CoinGecko requires IDs instead of symbols
-        symbol_to_id = {
-            "BTC": "bitcoin",
-            "ETH": "ethereum",
-            "SOL": "solana",
-            "ADA": "cardano",
-            "DOT": "polkadot",
-            "DOGE": "dogecoin",
-            "SHIB": "shiba-inu",
-            "AVAX": "avalanche-2",
-            "MATIC": "matic-network",
-            "LTC": "litecoin"
-        }
-        
-        coin_id = symbol_to_id.get(symbol)
-        if not coin_id:
-            raise Exception(f"Unknown cryptocurrency symbol: {symbol}")
+        coin_ids = {COINGECKO_IDS[symbol]: symbol for symbol in symbols if symbol in COINGECKO_IDS}
+        if not coin_ids:
+            raise Exception(f"Unknown cryptocurrency symbol: {', '.join(symbols)}")
         
-        url = f"https://api.coingecko.com/api/v3/coins/{coin_id}"
+        params = {
+            "ids": ",".join(coin_ids),
+            "vs_currencies": "usd",
+            "include_market_cap": "true",
+            "include_24hr_vol": "true",
+            "include_24hr_change": "true"
+        }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url)
-                
-                if response.status_code != 200:
-                    raise Exception(f"CoinGecko API error: {response.text}")
-                    
-                data = response.json()
+            client = self.http_clients.get("coingecko")
+            response = await client.get("/api/v3/simple/price", params=params)
+            
+            if response.status_code != 200:
+                raise Exception(f"CoinGecko API error: {response.text}")
                 
+            data = response.json()
+            
+            results = {}
+            for coin_id, symbol in coin_ids.items():
+                coin = data.get(coin_id)
+                if not coin or coin.get("usd") is None:
+                    continue
                 crypto_data = {
-                    "price": data["market_data"]["current_price"]["usd"],
-                    "change_24h": data["market_data"]["price_change_percentage_24h"],
-                    "market_cap": data["market_data"]["market_cap"]["usd"],
-                    "volume_24h": data["market_data"]["total_volume"]["usd"]
+                    "price": coin["usd"],
+                    "change_24h": coin.get("usd_24h_change") or 0.0,
+                    "market_cap": coin.get("usd_market_cap") or 0.0,
+                    "volume_24h": coin.get("usd_24h_vol") or 0.0
                 }
-                
-                crypto_name = data["name"]
-                
-                return crypto_data, crypto_name
-                
+                results[symbol] = (crypto_data, self.crypto_names.get(symbol, f"{symbol} Cryptocurrency"))
+            
+            return results
+            
         except Exception as e:
             raise Exception(f"Error retrieving data from CoinGecko: {str(e)}")
     
@@ -0,0 +1,156 @@
+"""
+Server-push crypto ticker.
+
+One background poller per tracked symbol refreshes a shared latest-price
+table and fans changes out to every subscriber of that symbol, so upstream
+load depends on how many symbols are tracked, not on how many clients are
+connected. Each subscriber only keeps the newest unsent update per symbol:
+a slow consumer gets coalesced updates instead of an ever-growing queue.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, Optional, Set
+
+from app.services.crypto_service import CryptoService
+
+logger = logging.getLogger(__name__)
+
+
+class TickerSubscription:
+    """Pending updates for one connected client, at most one per symbol."""
+
+    def __init__(self, symbols: Iterable[str]):
+        self.symbols: Set[str] = set(symbols)
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._event = asyncio.Event()
+
+    def push(self, symbol: str, update: Dict[str, Any]) -> bool:
+        """
+        Queue an update, replacing any unsent one for the same symbol.
+
+        Returns:
+            True when an unsent update was replaced (coalesced)
+        """
+        coalesced = symbol in self._pending
+        self._pending[symbol] = update
+        self._event.set()
+        return coalesced
+
+    async def next_updates(self, timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Wait for updates and take them all.
+
+        Args:
+            timeout: Seconds to wait before returning an empty dict
+
+        Returns:
+            Symbol -> latest update since the previous call
+        """
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return {}
+        updates, self._pending = self._pending, {}
+        self._event.clear()
+        return updates
+
+
+class CryptoTicker:
+    def __init__(self, crypto_service: CryptoService):
+        self.crypto_service = crypto_service
+        self.interval = float(os.getenv("CRYPTO_TICKER_INTERVAL", 15))
+        self.latest: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: Dict[str, Set[TickerSubscription]] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self.polls = 0
+        self.poll_errors = 0
+        self.updates_sent = 0
+        self.updates_coalesced = 0
+
+    def subscribe(self, symbols: Iterable[str]) -> TickerSubscription:
+        """
+        Subscribe to a set of symbols, starting pollers as needed.
+
+        The latest known price of each symbol is delivered right away.
+        """
+        subscription = TickerSubscription(symbols)
+        for symbol in subscription.symbols:
+            self._subscribers.setdefault(symbol, set()).add(subscription)
+            if symbol in self.latest:
+                subscription.push(symbol, self.latest[symbol])
+            if symbol not in self._pollers:
+                self._pollers[symbol] = asyncio.ensure_future(self._poll(symbol))
+        return subscription
+
+    def unsubscribe(self, subscription: TickerSubscription) -> None:
+        """Remove a subscription, stopping pollers nobody listens to anymore."""
+        for symbol in subscription.symbols:
+            subscribers = self._subscribers.get(symbol)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[symbol]
+                poller = self._pollers.pop(symbol, None)
+                if poller is not None:
+                    poller.cancel()
+
+    async def _poll(self, symbol: str) -> None:
+        """Refresh one symbol until its last subscriber leaves."""
+        while True:
+            self.polls += 1
+            try:
+                results, errors = await self.crypto_service.get_crypto_prices([symbol])
+                if symbol in results:
+                    crypto_data, crypto_name = results[symbol]
+                    self._publish(symbol, crypto_name, crypto_data)
+                else:
+                    self.poll_errors += 1
+                    logger.warning(f"Ticker poll for {symbol} failed: {errors.get(symbol)}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.poll_errors += 1
+                logger.error(f"Ticker poll for {symbol} failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def _publish(self, symbol: str, name: str, crypto_data: Dict[str, Any]) -> None:
+        previous = self.latest.get(symbol)
+        if previous is not None and previous["crypto"] == crypto_data:
+            return
+        update = {
+            "symbol": symbol,
+            "name": name,
+            "crypto": crypto_data,
+            "updated_at": time.time()
+        }
+        self.latest[symbol] = update
+        for subscription in list(self._subscribers.get(symbol, ())):
+            if subscription.push(symbol, update):
+                # The client had not read the previous update yet
+                self.updates_coalesced += 1
+            self.updates_sent += 1
+
+    def stats(self) -> Dict[str, Any]:
+        subscriptions = set()
+        for subscribers in self._subscribers.values():
+            subscriptions.update(subscribers)
+        return {
+            "symbols_tracked": len(self._pollers),
+            "subscribers": len(subscriptions),
+            "polls": self.polls,
+            "poll_errors": self.poll_errors,
+            "updates_sent": self.updates_sent,
+            "updates_coalesced": self.updates_coalesced,
+        }
+
+    async def aclose(self) -> None:
+        """Stop every poller."""
+        pollers, self._pollers = self._pollers, {}
+        for poller in pollers.values():
+            poller.cancel()
+        await asyncio.gather(*pollers.values(), return_exceptions=True)
+        self._subscribers.clear()
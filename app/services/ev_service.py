@@ -1,15 +1,52 @@
 import os
-import httpx
+import random
+import asyncio
+import logging
 import urllib.parse
-from typing import Dict, Any, List, Tuple
-from opencage.geocoder import OpenCageGeocode
+from typing import Dict, Any, List, Tuple, Optional
+from app.services.http_client import HTTPClientManager, http_clients as default_http_clients
+from app.services.geocoding_service import GeocodingService
+from app.services.registry import services
+from app.services.station_index import Bounds, StationTileIndex, covering_circle, split_bounds
+from app.services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Stations returned per search
+MAX_RESULTS = 10
 
 class EVStationService:
-    def __init__(self):
-        self.geocoder = OpenCageGeocode(os.getenv("OPENCAGE_API_KEY"))
+    def __init__(self, http_clients: Optional[HTTPClientManager] = None, geocoding: Optional[GeocodingService] = None):
+        self.http_clients = http_clients or default_http_clients
+        # Cached geocoding shared with the weather service
+        self.geocoding = geocoding or services.get(GeocodingService)
         # Note: Open Charge Map API key would normally go here,
         # but their API supports anonymous access
         
+        # Stations are kept in a local tile index so repeat searches in the
+        # same area are answered without calling Open Charge Map
+        self.index = StationTileIndex(
+            tile_size=float(os.getenv("EV_TILE_SIZE_DEGREES", 0.1)),
+            ttl=float(os.getenv("EV_TILE_TTL", 6 * 3600)),
+            max_tiles=int(os.getenv("EV_MAX_TILES", 5000)),
+            dense_ttl=float(os.getenv("EV_DENSE_TILE_TTL", 3600))
+        )
+        self.tile_max_results = int(os.getenv("EV_TILE_MAX_RESULTS", 500))
+        # Times a capped tile query is split into quarters before giving up on the tile
+        self.tile_max_splits = int(os.getenv("EV_TILE_MAX_SPLITS", 2))
+        # Upstream queries one tile fill may make, splits included
+        self.tile_max_queries = max(1, int(os.getenv("EV_TILE_MAX_QUERIES", 9)))
+        self.max_tiles_per_search = int(os.getenv("EV_MAX_TILES_PER_SEARCH", 25))
+        # Concurrent searches needing the same tile share one fill
+        self.tile_loads = SingleFlight("ev_tiles")
+        self.tile_hits = 0
+        self.tile_misses = 0
+        self.tile_fills = 0
+        self.direct_queries = 0
+        self.tile_splits = 0
+        self.tile_queries = 0
+        self.truncated_tiles = 0
+        
     async def geocode_location(self, location: str) -> Tuple[Dict[str, float], str]:
         """
         Geocode a location string to get coordinates.
@@ -24,21 +61,7 @@ class EVStationService:
             Exception: If geocoding fails
         """
         try:
-            results = self.geocoder.geocode(location)
-            
-            if not results or len(results) == 0:
-                raise Exception(f"Could not geocode location: {location}")
-                
-            top_result = results[0]
-            coords = {
-                "lat": top_result["geometry"]["lat"],
-                "lng": top_result["geometry"]["lng"]
-            }
-            
-            # Get formatted location name
-            formatted_location = top_result.get("formatted", location)
-            
-            return coords, formatted_location
+            return await self.geocoding.geocode(location)
             
         except Exception as e:
             raise Exception(f"Geocoding error: {str(e)}")
@@ -47,94 +70,223 @@ class EVStationService:
         """
         Find EV charging stations near the specified coordinates.
         
+        Searches are answered from the local tile index once their tiles are
+        loaded. A search needing tiles that are not loaded yet (or have gone
+        stale) is answered with one direct Open Charge Map query while the
+        tiles are filled in the background; areas too dense to load are
+        always queried directly.
+        
         Args:
             lat: Latitude
             lng: Longitude
             radius: Search radius in kilometers
             
         Returns:
-            List of charging station dictionaries
+            List of charging station dictionaries, nearest first
             
         Raises:
             Exception: If station retrieval fails
         """
+        radius = radius or 5
+        
+        try:
+            tiles = self.index.tiles_for_circle(lat, lng, radius)
+            
+            # Very wide searches would load too many tiles, dense ones cannot be loaded
+            direct = len(tiles) > self.max_tiles_per_search or self.index.has_dense(tiles)
+            if not direct:
+                missing = self.index.missing_tiles(tiles)
+                if missing:
+                    self.tile_misses += 1
+                    # Load the area for later searches without making this one wait
+                    for tile in missing:
+                        self.tile_loads.launch(tile, lambda tile=tile: self._fill_tile(tile))
+                    direct = True
+                else:
+                    self.tile_hits += 1
+            
+            if direct:
+                self.direct_queries += 1
+                stations = await self._query_stations(lat, lng, radius, MAX_RESULTS)
+            else:
+                stations = self.index.search(lat, lng, radius, limit=MAX_RESULTS)
+            
+            return [self._with_availability(station) for station in stations]
+            
+        except Exception as e:
+            raise Exception(f"EV station retrieval error: {str(e)}")
+    
+    async def _fill_tile(self, tile: Tuple[int, int]) -> None:
+        """
+        Fill one tile from Open Charge Map.
+        
+        Tiles with more stations than the split queries can return are
+        marked dense instead, so searches there skip the tile index.
+        """
+        budget = [self.tile_max_queries]
+        try:
+            stations = await self._query_area(self.index.tile_bounds(tile), self.tile_max_splits, budget)
+        except Exception as e:
+            # Nobody waits for the fill; the tile is tried again by the next search
+            logger.warning(f"Could not load EV station tile {tile}: {str(e)}")
+            return
+        if stations is None:
+            self.truncated_tiles += 1
+            self.index.mark_dense(tile)
+            logger.warning(f"Open Charge Map has more than {self.tile_max_results} stations per query in tile {tile}, not loading it")
+            return
+        self.index.store_tile(tile, stations)
+        self.tile_fills += 1
+    
+    async def _query_area(self, bounds: Bounds, splits: int, budget: List[int]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Query every station in a latitude/longitude box.
+        
+        A query that hits the result cap may have dropped stations, so the
+        box is queried again as four quarters, up to `splits` times deep.
+        
+        Args:
+            bounds: Box to query
+            splits: Times the box may still be split
+            budget: Upstream queries left for the whole fill, shared by
+                every quarter
+        
+        Returns:
+            Stations in and around the box, or None if a query was still
+            capped after the last split or the budget ran out
+        """
+        if budget[0] <= 0:
+            return None
+        budget[0] -= 1
+        self.tile_queries += 1
+        lat, lng, radius = covering_circle(bounds)
+        stations = await self._query_stations(lat, lng, radius, self.tile_max_results)
+        if len(stations) < self.tile_max_results:
+            return stations
+        if splits <= 0 or budget[0] < 4:
+            return None
+        
+        self.tile_splits += 1
+        quarters = await asyncio.gather(*(self._query_area(quarter, splits - 1, budget) for quarter in split_bounds(bounds)))
+        if any(quarter is None for quarter in quarters):
+            return None
+        # The circles of neighbouring quarters overlap
+        unique = {
+            (station["id"], station["latitude"], station["longitude"]): station
+            for quarter in quarters for station in quarter
+        }
+        return list(unique.values())
+    
+    async def _query_stations(self, lat: float, lng: float, distance: float, max_results: int) -> List[Dict[str, Any]]:
+        """
+        Query Open Charge Map for stations around a point.
+        
+        Args:
+            lat: Latitude
+            lng: Longitude
+            distance: Search radius in kilometers
+            max_results: Maximum number of stations to return
+            
+        Returns:
+            List of parsed station dictionaries (without availability)
+            
+        Raises:
+            Exception: If the API call fails
+        """
         # Open Charge Map API endpoint
-        url = "https://api.openchargemap.io/v3/poi"
+        path = "/v3/poi"
         
         params = {
             "latitude": lat,
             "longitude": lng,
-            "distance": radius,
+            "distance": distance,
             "distanceunit": "km",
-            "maxresults": 10,
+            "maxresults": max_results,
             "compact": True,
             "verbose": False,
             "output": "json"
         }
         
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                
-                if response.status_code != 200:
-                    raise Exception(f"Open Charge Map API error: {response.text}")
-                    
-                stations_data = response.json()
-                
-                # Process and format the stations data
-                stations = []
-                for station in stations_data:
-                    # Extract connector types
-                    connector_types = []
-                    if "Connections" in station:
-                        for connection in station["Connections"]:
-                            if "ConnectionType" in connection and "Title" in connection["ConnectionType"]:
-                                connector_types.append(connection["ConnectionType"]["Title"])
-                    
-                    # Extract address
-                    address = ""
-                    if "AddressInfo" in station:
-                        address_parts = []
-                        if "AddressLine1" in station["AddressInfo"] and station["AddressInfo"]["AddressLine1"]:
-                            address_parts.append(station["AddressInfo"]["AddressLine1"])
-                        if "Town" in station["AddressInfo"] and station["AddressInfo"]["Town"]:
-                            address_parts.append(station["AddressInfo"]["Town"])
-                        if "StateOrProvince" in station["AddressInfo"] and station["AddressInfo"]["StateOrProvince"]:
-                            address_parts.append(station["AddressInfo"]["StateOrProvince"])
-                        address = ", ".join(address_parts)
-                    
-                    # Get station name
-                    name = ""
-                    if "AddressInfo" in station and "Title" in station["AddressInfo"]:
-                        name = station["AddressInfo"]["Title"]
-                    else:
-                        name = f"Charging Station {station.get('ID', '')}"
-                    
-                    # Get number of charging points
-                    total_points = 0
-                    if "NumberOfPoints" in station and station["NumberOfPoints"]:
-                        total_points = station["NumberOfPoints"]
-                    else:
-                        # Estimate from connections
-                        total_points = len(station.get("Connections", []))
-                    
-                    # Simulate availability (in a real app, this would come from a real-time API)
-                    # For demo purposes, we'll just set a random number of available points
-                    import random
-                    available_points = random.randint(0, total_points)
-                    
-                    stations.append({
-                        "name": name,
-                        "address": address,
-                        "available": available_points,
-                        "total": total_points,
-                        "connector_types": list(set(connector_types))  # Remove duplicates
-                    })
-                
-                return stations
-                
-        except Exception as e:
-            raise Exception(f"EV station retrieval error: {str(e)}")
+        client = self.http_clients.get("openchargemap")
+        response = await client.get(path, params=params)
+        
+        if response.status_code != 200:
+            raise Exception(f"Open Charge Map API error: {response.text}")
+            
+        stations_data = response.json()
+        
+        # Process and format the stations data, skipping entries without coordinates
+        return [
+            self._parse_station(station) for station in stations_data
+            if station.get("AddressInfo", {}).get("Latitude") is not None
+            and station.get("AddressInfo", {}).get("Longitude") is not None
+        ]
+    
+    def _parse_station(self, station: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert an Open Charge Map POI into our station dictionary."""
+        # Extract connector types
+        connector_types = []
+        if "Connections" in station:
+            for connection in station["Connections"]:
+                if "ConnectionType" in connection and "Title" in connection["ConnectionType"]:
+                    connector_types.append(connection["ConnectionType"]["Title"])
+        
+        # Extract address
+        address = ""
+        if "AddressInfo" in station:
+            address_parts = []
+            if "AddressLine1" in station["AddressInfo"] and station["AddressInfo"]["AddressLine1"]:
+                address_parts.append(station["AddressInfo"]["AddressLine1"])
+            if "Town" in station["AddressInfo"] and station["AddressInfo"]["Town"]:
+                address_parts.append(station["AddressInfo"]["Town"])
+            if "StateOrProvince" in station["AddressInfo"] and station["AddressInfo"]["StateOrProvince"]:
+                address_parts.append(station["AddressInfo"]["StateOrProvince"])
+            address = ", ".join(address_parts)
+        
+        # Get station name
+        name = ""
+        if "AddressInfo" in station and "Title" in station["AddressInfo"]:
+            name = station["AddressInfo"]["Title"]
+        else:
+            name = f"Charging Station {station.get('ID', '')}"
+        
+        # Get number of charging points
+        total_points = 0
+        if "NumberOfPoints" in station and station["NumberOfPoints"]:
+            total_points = station["NumberOfPoints"]
+        else:
+            # Estimate from connections
+            total_points = len(station.get("Connections", []))
+        
+        return {
+            "id": str(station.get("ID", "")),
+            "name": name,
+            "address": address,
+            "latitude": station["AddressInfo"]["Latitude"],
+            "longitude": station["AddressInfo"]["Longitude"],
+            "total": total_points,
+            "connector_types": list(set(connector_types))  # Remove duplicates
+        }
+    
+    def _with_availability(self, station: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy a stored station and add a simulated availability count."""
+        # Simulate availability (in a real app, this would come from a real-time API)
+        # For demo purposes, we'll just set a random number of available points
+        result = dict(station)
+        result["available"] = random.randint(0, station["total"])
+        return result
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tiles_loaded": len(self.index),
+            "tile_hits": self.tile_hits,
+            "tile_misses": self.tile_misses,
+            "tile_fills": self.tile_fills,
+            "direct_queries": self.direct_queries,
+            "tile_splits": self.tile_splits,
+            "tile_queries": self.tile_queries,
+            "truncated_tiles": self.truncated_tiles,
+        }
     
     def generate_map_url(self, lat: float, lng: float, location: str) -> str:
         """
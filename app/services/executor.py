@@ -0,0 +1,247 @@
+"""
+Per-provider thread pools for blocking SDK calls made from async handlers.
+
+Several provider SDKs (OpenCage, Gemini, Groq, YouTube transcripts,
+`requests`) only offer synchronous calls. Running them directly inside an
+`async def` freezes the event loop for every other request, so they go
+through `run_blocking(provider, fn, ...)` instead. Each provider gets its
+own small, named pool with a bounded queue, so one slow provider can only
+exhaust its own workers and never starves the others.
+
+Pool sizes can be tuned with EXECUTOR_<PROVIDER>_WORKERS and
+EXECUTOR_<PROVIDER>_MAX_QUEUE environment variables.
+"""
+import os
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Default worker counts per provider
+PROVIDER_WORKERS: Dict[str, int] = {
+    "opencage": 4,
+    "gemini": 4,
+    "groq": 4,
+    "youtube": 4,
+    "storage": 4,
+    "summarizer": 2,
+}
+DEFAULT_WORKERS = 4
+
+# Calls allowed to wait for a worker, as a multiple of the worker count
+QUEUE_FACTOR = 8
+
+# Marks the end of an `iterate_blocking` stream
+_END = object()
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when a provider's queue is full and the call is shed."""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class ProviderPool:
+    """A named, size-limited thread pool with queue and wait-time accounting."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"blocking-{name}")
+
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run `fn(*args, **kwargs)` on this pool and await its result."""
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturatedError(f"Too many pending {self.name} calls, try again later")
+            self.queued += 1
+            self.submitted += 1
+
+        submitted_at = time.perf_counter()
+        context = contextvars.copy_context()
+        started = threading.Event()
+
+        def call() -> T:
+            wait = time.perf_counter() - submitted_at
+            with self._lock:
+                started.set()
+                self.queued -= 1
+                self.active += 1
+                self.started += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                return context.run(fn, *args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        def on_done(future: Future) -> None:
+            # A call cancelled while still queued never reaches call()
+            if future.cancelled():
+                with self._lock:
+                    if not started.is_set():
+                        self.queued -= 1
+
+        future = self.executor.submit(call)
+        future.add_done_callback(on_done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the pool's counters."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "active": self.active,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait / self.started * 1000, 3) if self.started > 0 else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class BlockingExecutors:
+    """Creates and owns one `ProviderPool` per provider name."""
+
+    def __init__(self):
+        self._pools: Dict[str, ProviderPool] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str) -> ProviderPool:
+        pool = self._pools.get(provider)
+        if pool is not None:
+            return pool
+
+        with self._lock:
+            pool = self._pools.get(provider)
+            if pool is None:
+                key = provider.upper()
+                workers = _env_int(f"EXECUTOR_{key}_WORKERS", PROVIDER_WORKERS.get(provider, DEFAULT_WORKERS))
+                max_queue = _env_int(f"EXECUTOR_{key}_MAX_QUEUE", workers * QUEUE_FACTOR)
+                pool = ProviderPool(provider, max(1, workers), max(0, max_queue))
+                self._pools[provider] = pool
+                logger.info(f"Created {provider} executor with {pool.max_workers} workers")
+        return pool
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: pool.stats() for name, pool in list(self._pools.items())}
+
+    def shutdown(self) -> None:
+        """Stop every pool; pools are re-created on next use."""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.shutdown()
+
+
+# Process-wide pools shared by all services
+executors = BlockingExecutors()
+
+
+async def run_blocking(provider: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking call on the provider's thread pool.
+
+    Args:
+        provider: Provider name, selects the pool (e.g. "opencage", "gemini")
+        fn: Blocking callable
+        *args, **kwargs: Arguments for `fn`
+
+    Returns:
+        Whatever `fn` returns
+
+    Raises:
+        ExecutorSaturatedError: If the provider's queue is full
+    """
+    return await executors.get(provider).run(fn, *args, **kwargs)
+
+
+async def iterate_blocking(provider: str, fn: Callable[..., Iterable[T]], *args: Any, **kwargs: Any) -> AsyncIterator[T]:
+    """
+    Consume a blocking iterator on the provider's thread pool.
+
+    Used for streaming SDK responses: `fn(*args, **kwargs)` is called on a
+    worker and every item it yields is handed to the event loop as soon as
+    it arrives. When the consumer stops early, the worker stops after the
+    item it is currently waiting for.
+
+    Args:
+        provider: Provider name, selects the pool
+        fn: Blocking callable returning an iterable
+        *args, **kwargs: Arguments for `fn`
+
+    Yields:
+        The items of the iterable, in order
+
+    Raises:
+        ExecutorSaturatedError: If the provider's queue is full
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def produce() -> None:
+        try:
+            for item in fn(*args, **kwargs):
+                if stopped.is_set():
+                    return
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except BaseException as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (_END, e))
+            return
+        loop.call_soon_threadsafe(queue.put_nowait, (_END, None))
+
+    def on_done(future: asyncio.Future) -> None:
+        # produce() reports its own errors; this catches a rejected call
+        if not future.cancelled() and future.exception() is not None:
+            queue.put_nowait((_END, future.exception()))
+
+    producer = asyncio.ensure_future(executors.get(provider).run(produce))
+    producer.add_done_callback(on_done)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
@@ -0,0 +1,108 @@
+"""
+Local extractive summarizer.
+
+Picks the `max_points` most central sentences of a transcript using TF-IDF
+weights: every sentence is scored by the cosine similarity of its TF-IDF
+vector to the centroid of the whole transcript. The sparse
+(sentence, term) pairs are kept as flat NumPy arrays, so a two-hour
+transcript is scored in a few milliseconds without building a dense
+matrix. It needs no network, so it serves as a fast mode and as the
+fallback when the LLM is too slow or failing.
+"""
+import re
+from typing import Dict, List, Set
+
+import numpy as np
+
+from app.services.transcript_cleaner import Segments, clean_segments
+
+WORD = re.compile(r"[a-z0-9']+")
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just know let like me more most my no nor not now of off on
+once only or other our out over own really right same she should so some such than that the their them then
+there these they this those through to too under until up very was we well were what when where which while
+who whom why will with would yeah you your going get got gonna okay oh
+""".split())
+
+# Sentences shorter than this rarely make a useful key point
+MIN_WORDS = 6
+
+# Skip a sentence that shares more than this fraction of its terms with one already picked
+MAX_OVERLAP = 0.5
+
+
+class ExtractiveSummarizer:
+    def summarize(self, segments: Segments, max_points: int = 3) -> List[str]:
+        """
+        Select the key sentences of a transcript.
+
+        Args:
+            segments: Transcript segments with text, start and duration
+            max_points: Number of sentences to return
+
+        Returns:
+            Up to `max_points` sentences, in the order they were spoken
+        """
+        sentences, _ = clean_segments(segments, sentences=True)
+        texts = [sentence["text"] for sentence in sentences]
+        terms = [[word for word in WORD.findall(text.lower()) if word not in STOPWORDS] for text in texts]
+        candidates = [i for i, text in enumerate(texts) if len(text.split()) >= MIN_WORDS and terms[i]]
+        if not candidates:
+            candidates = [i for i in range(len(texts)) if terms[i]]
+        if not candidates:
+            return []
+
+        scores = self._score(terms)
+
+        picked: List[int] = []
+        picked_terms: List[Set[str]] = []
+        for index in sorted(candidates, key=lambda i: scores[i], reverse=True):
+            words = set(terms[index])
+            if any(len(words & other) > MAX_OVERLAP * len(words) for other in picked_terms):
+                continue
+            picked.append(index)
+            picked_terms.append(words)
+            if len(picked) == max_points:
+                break
+
+        return [self._as_point(texts[index]) for index in sorted(picked)]
+
+    def _score(self, terms: List[List[str]]) -> np.ndarray:
+        """Cosine similarity of each sentence's TF-IDF vector to the transcript centroid."""
+        vocabulary: Dict[str, int] = {}
+        sentence_ids = []
+        term_ids = []
+        for sentence, words in enumerate(terms):
+            for word in words:
+                sentence_ids.append(sentence)
+                term_ids.append(vocabulary.setdefault(word, len(vocabulary)))
+
+        n_sentences = len(terms)
+        n_terms = len(vocabulary)
+        if n_terms == 0:
+            return np.zeros(n_sentences)
+
+        # Unique (sentence, term) pairs with their counts
+        keys = np.asarray(sentence_ids, dtype=np.int64) * n_terms + np.asarray(term_ids, dtype=np.int64)
+        pairs, tf = np.unique(keys, return_counts=True)
+        pair_sentences = pairs // n_terms
+        pair_terms = pairs % n_terms
+
+        document_frequency = np.bincount(pair_terms, minlength=n_terms)
+        idf = np.log((1 + n_sentences) / (1 + document_frequency)) + 1.0
+        weights = tf * idf[pair_terms]
+
+        centroid = np.bincount(pair_terms, weights=weights, minlength=n_terms) / n_sentences
+        dots = np.bincount(pair_sentences, weights=weights * centroid[pair_terms], minlength=n_sentences)
+        norms = np.sqrt(np.bincount(pair_sentences, weights=weights * weights, minlength=n_sentences))
+        centroid_norm = np.linalg.norm(centroid)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = dots / (norms * centroid_norm)
+        return np.nan_to_num(scores)
+
+    def _as_point(self, text: str) -> str:
+        text = text.strip()
+        return text[0].upper() + text[1:] if text else text
@@ -1,85 +1,161 @@
 import os
-import requests
+import json
 import random
-from typing import Optional
+import asyncio
+import httpx
+from typing import Any, Dict, Optional
+from app.services.http_client import HTTPClientManager, http_clients as default_http_clients
+from app.services.image_store import ImageStore
+from app.services.prompt_index import PromptIndex
+from app.services.singleflight import SingleFlight
+from app.services.registry import services
+
+# Added to every prompt by `_sanitize_prompt`
+QUALITY_PREFIX = "A high quality, detailed digital art image of "
 
 class FluxService:
-    def __init__(self):
+    def __init__(self, store: Optional[ImageStore] = None, http_clients: Optional[HTTPClientManager] = None,
+                 prompts: Optional[PromptIndex] = None):
         self.api_key = os.getenv("FLUX_API_KEY")
         # Use a different endpoint structure for stability-ai instead of flux
         self.api_url = "https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image"
+        self.http_clients = http_clients or default_http_clients
+        # Generations in flight at once; the rest wait here instead of tying up connections
+        self.limit = asyncio.Semaphore(max(1, int(os.getenv("IMAGE_STABILITY_CONCURRENCY", 2))))
+        # Generated images, keyed by prompt and parameters
+        self.store = store or services.get(ImageStore)
+        # Earlier prompts, to serve near-duplicates from the store
+        self.prompts = prompts or services.get(PromptIndex)
+        self.generations = SingleFlight("image_generation")
         
-    async def generate_image(self, prompt: str) -> Optional[str]:
+    async def generate_image(self, prompt: str, allow_similar: bool = True, raise_on_error: bool = False) -> Optional[str]:
         """
         Generate an image based on a text prompt using Stability AI.
         
         Args:
             prompt: Text prompt describing the image to generate
+            allow_similar: Serve the stored image of a near-identical earlier
+                prompt instead of generating a new one
+            raise_on_error: Raise when generation fails instead of returning
+                a placeholder, for callers that report failures themselves
             
         Returns:
-            URL of the generated image, or None if generation failed
+            URL of the generated image, served from the image store, or a
+            placeholder URL if generation failed
             
         Raises:
-            Exception: If image generation fails
+            Exception: If generation fails and `raise_on_error` is set
         """
         try:
             # Ensure the prompt is safe and appropriate
             safe_prompt = self._sanitize_prompt(prompt)
+            payload = self._payload(safe_prompt)
             
-            # Generate image using Stability AI API
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            }
+            # Serve a prompt that was generated before straight from the store
+            key = self._store_key(safe_prompt, payload)
+            namespace = json.dumps(self._params(payload), sort_keys=True)
+            subject = self._subject(safe_prompt)
+            digest = await self.store.lookup(key)
+            if digest is not None:
+                # Relearn prompts served from the store, e.g. after a restart
+                self.prompts.add(namespace, subject, digest)
+                return self.store.url(digest)
             
-            payload = {
-                "text_prompts": [
-                    {
-                        "text": safe_prompt,
-                        "weight": 1.0
-                    }
-                ],
-                "cfg_scale": 7,
-                "height": 512,
-                "width": 512,
-                "samples": 1,
-                "steps": 30
-            }
+            # Then the image of a near-identical prompt
+            if allow_similar:
+                match = self.prompts.find(namespace, subject)
+                if match is not None:
+                    if self.store.exists(match[0]):
+                        return self.store.url(match[0])
+                    self.prompts.forget(match[0])
+            else:
+                self.prompts.opt_outs += 1
             
-            try:
-                response = requests.post(
-                    self.api_url,
-                    json=payload,
-                    headers=headers
-                )
-                
-                # If the API request fails, fall back to a placeholder
-                if response.status_code != 200:
-                    print(f"Stability AI API error: Status {response.status_code}")
-                    print(f"Response: {response.text}")
-                    return self._get_placeholder_image(prompt)
-                
-                response_json = response.json()
-                
-                # Extract image data from response (each image is base64 encoded)
-                if "artifacts" in response_json and len(response_json["artifacts"]) > 0:
-                    # For simplicity in this demo, we'll use a placeholder instead of handling the base64 image
-                    # In a real app, you would decode and save the base64 image data
-                    return self._get_unsplash_image(prompt)
-                else:
-                    print("No image artifacts in the response")
-                    return self._get_placeholder_image(prompt)
-                
-            except requests.RequestException as e:
-                print(f"Request error: {str(e)}")
-                return self._get_placeholder_image(prompt)
+            # Identical prompts arriving together share one generation
+            return await self.generations.do(key, lambda: self._generate(key, payload, namespace, subject))
             
         except Exception as e:
             print(f"Error generating image: {str(e)}")
+            if raise_on_error:
+                raise
             # For demo purposes, return a placeholder image if real generation fails
             return self._get_placeholder_image(prompt)
     
+    def request_key(self, prompt: str) -> str:
+        """Key shared by every request that would produce the same image."""
+        safe_prompt = self._sanitize_prompt(prompt)
+        return self._store_key(safe_prompt, self._payload(safe_prompt))
+    
+    def _payload(self, safe_prompt: str) -> Dict[str, Any]:
+        return {
+            "text_prompts": [
+                {
+                    "text": safe_prompt,
+                    "weight": 1.0
+                }
+            ],
+            "cfg_scale": 7,
+            "height": 512,
+            "width": 512,
+            "samples": 1,
+            "steps": 30
+        }
+    
+    def _params(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Everything besides the prompt that changes the generated image."""
+        params = {key: value for key, value in payload.items() if key != "text_prompts"}
+        return dict(params, engine=self.api_url)
+    
+    def _store_key(self, safe_prompt: str, payload: Dict[str, Any]) -> str:
+        return self.store.key(safe_prompt, self._params(payload))
+    
+    def _subject(self, safe_prompt: str) -> str:
+        """What the user asked for, without the quality instructions shared by every prompt."""
+        if safe_prompt.startswith(QUALITY_PREFIX):
+            return safe_prompt[len(QUALITY_PREFIX):]
+        return safe_prompt
+    
+    async def _generate(self, key: str, payload: Dict[str, Any], namespace: str, subject: str) -> str:
+        """
+        Generate an image with Stability AI and store it.
+        
+        Args:
+            key: Store key of the generation request
+            payload: Request body for the text-to-image endpoint
+            namespace: Generation settings, for the prompt index
+            subject: Prompt without the quality instructions, for the prompt index
+            
+        Returns:
+            URL of the stored image
+            
+        Raises:
+            Exception: If the request fails or returns no image
+        """
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        }
+        
+        client = self.http_clients.get("stability")
+        try:
+            async with self.limit:
+                response = await client.post(self.api_url, json=payload, headers=headers)
+        except httpx.HTTPError as e:
+            raise Exception(f"Request error: {str(e)}")
+        
+        if response.status_code != 200:
+            raise Exception(f"Stability AI API error: Status {response.status_code}, response: {response.text}")
+        
+        # Each image is returned base64 encoded
+        artifacts = response.json().get("artifacts") or []
+        if not artifacts or not artifacts[0].get("base64"):
+            raise Exception("No image artifacts in the response")
+        
+        digest = await self.store.put_base64(key, artifacts[0]["base64"])
+        self.prompts.add(namespace, subject, digest)
+        return self.store.url(digest)
+    
     def _sanitize_prompt(self, prompt: str) -> str:
         """
         Sanitize the prompt to ensure it's appropriate and will work well with image generation.
@@ -101,37 +177,10 @@ class FluxService:
             sanitized = sanitized.replace(term, "****")
             
         # Prepend with quality instructions
-        quality_prompt = f"A high quality, detailed digital art image of {sanitized}"
+        quality_prompt = f"{QUALITY_PREFIX}{sanitized}"
         
         return quality_prompt
     
-    def _get_unsplash_image(self, prompt: str) -> str:
-        """
-        Get a relevant image from Unsplash as a fallback.
-        
-        Args:
-            prompt: Original prompt
-            
-        Returns:
-            Unsplash image URL
-        """
-        try:
-            # Create a clean search term - remove special chars and limit length
-            words = [word for word in prompt.split() if len(word) > 2][:3]  # Take up to 3 significant words
-            search_term = "-".join(words)
-            if not search_term:
-                search_term = "landscape"  # Default fallback
-            
-            # Make sure search term is clean for a URL
-            search_term = "".join(c for c in search_term if c.isalnum() or c == '-')
-            
-            # Use Unsplash source for a random image related to the search term
-            return f"https://source.unsplash.com/640x480/?{search_term}"
-        except Exception as e:
-            print(f"Error creating Unsplash URL: {e}")
-            # Ultra-safe fallback
-            return "https://via.placeholder.com/640x480/0000FF/FFFFFF?text=Image"
-        
     def _get_placeholder_image(self, prompt: str) -> str:
         """
         Get a placeholder image URL for when real generation fails.
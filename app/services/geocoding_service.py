@@ -0,0 +1,158 @@
+import os
+import re
+import time
+import logging
+import unicodedata
+from typing import Dict, Any, Tuple, Optional
+from opencage.geocoder import OpenCageGeocode
+from app.services.cache import TTLCache, SQLiteCache, data_path
+from app.services.executor import run_blocking
+from app.services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Abbreviations expanded before building the cache key, so that
+# "5th Ave, NYC" and "5th avenue new york city" share one entry
+# "st" (street or saint) and single letters (compass points or initials)
+# are left alone: expanding them would merge different places
+ABBREVIATIONS = {
+    "ave": "avenue",
+    "av": "avenue",
+    "rd": "road",
+    "blvd": "boulevard",
+    "hwy": "highway",
+    "ln": "lane",
+    "sq": "square",
+    "mt": "mount",
+    "ft": "fort",
+    "nyc": "new york city",
+    "sf": "san francisco",
+    "us": "united states",
+    "usa": "united states",
+    "uk": "united kingdom",
+    "uae": "united arab emirates",
+}
+
+
+def normalize_location(location: str) -> str:
+    """
+    Build the cache key for a location query.
+
+    Folds case and accents, drops punctuation, collapses whitespace and
+    expands common abbreviations.
+
+    Args:
+        location: Raw location string (e.g., "Tokyo,  Japan!")
+
+    Returns:
+        Normalized key (e.g., "tokyo japan")
+    """
+    text = unicodedata.normalize("NFKD", location)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    # U.S.A. -> usa, then any other punctuation becomes a separator
+    text = re.sub(r"(?<=\b\w)\.(?=\w\b)", "", text).replace(".", " ")
+    text = re.sub(r"[^\w\s]", " ", text)
+    words = [ABBREVIATIONS.get(word, word) for word in text.split()]
+    return " ".join(words)
+
+
+class GeocodingService:
+    """
+    OpenCage geocoding shared by the weather and EV station services.
+
+    Results are cached under a normalized query key, first in an in-memory
+    LRU and then in a local SQLite file (write-through) so they survive
+    restarts. Queries OpenCage cannot resolve are cached for a short time
+    too, so repeated typos do not hit the API.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None):
+        self.geocoder = OpenCageGeocode(os.getenv("OPENCAGE_API_KEY"))
+        self.ttl = float(os.getenv("GEOCODE_CACHE_TTL", 30 * 24 * 3600))
+        self.negative_ttl = float(os.getenv("GEOCODE_NEGATIVE_TTL", 600))
+        self.memory = TTLCache(max_entries=int(os.getenv("GEOCODE_CACHE_SIZE", 2048)))
+        self.store = SQLiteCache(cache_path or data_path("geocode_cache.sqlite3"), "geocode")
+        # Concurrent misses for the same normalized query share one OpenCage call
+        self.lookups = SingleFlight("geocoding")
+
+        self.disk_hits = 0
+        self.negative_hits = 0
+        self.upstream_calls = 0
+
+    async def geocode(self, location: str) -> Tuple[Dict[str, float], str]:
+        """
+        Geocode a location string to get coordinates.
+
+        Args:
+            location: Location string (e.g., "Tokyo, Japan")
+
+        Returns:
+            Tuple of (coordinates dict with lat/lng, formatted location name)
+
+        Raises:
+            Exception: If the location cannot be geocoded
+        """
+        key = normalize_location(location)
+        if not key:
+            raise Exception(f"Could not geocode location: {location}")
+
+        entry = await self._lookup(key)
+        if entry is None:
+            entry = await self.lookups.do(key, lambda: self._fetch_and_store(key, location))
+
+        if not entry["found"]:
+            raise Exception(f"Could not geocode location: {location}")
+
+        return dict(entry["coords"]), entry["formatted"]
+
+    async def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Check memory, then disk (on the storage executor), promoting disk hits into memory."""
+        entry = self.memory.get(key)
+        if entry is None:
+            stored = await run_blocking("storage", self.store.get, key)
+            if stored is not None:
+                entry, expires_at = stored
+                ttl = expires_at - time.time() if expires_at is not None else None
+                self.memory.set(key, entry, ttl=ttl)
+                self.disk_hits += 1
+        if entry is not None and not entry["found"]:
+            self.negative_hits += 1
+        return entry
+
+    async def _fetch_and_store(self, key: str, location: str) -> Dict[str, Any]:
+        entry = await self._fetch(location)
+        ttl = self.ttl if entry["found"] else self.negative_ttl
+        self.memory.set(key, entry, ttl=ttl)
+        await run_blocking("storage", self.store.set, key, entry, ttl=ttl)
+        return entry
+
+    async def _fetch(self, location: str) -> Dict[str, Any]:
+        """Ask OpenCage for a location; upstream errors propagate and are not cached."""
+        self.upstream_calls += 1
+        logger.info(f"Geocoding location upstream: {location}")
+        results = await run_blocking("opencage", self.geocoder.geocode, location)
+
+        if not results or len(results) == 0:
+            logger.info(f"No geocoding results found for: {location}")
+            return {"found": False}
+
+        top_result = results[0]
+        return {
+            "found": True,
+            "coords": {
+                "lat": top_result["geometry"]["lat"],
+                "lng": top_result["geometry"]["lng"]
+            },
+            "formatted": top_result.get("formatted", location)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.stats(),
+            "disk_hits": self.disk_hits,
+            "negative_hits": self.negative_hits,
+            "upstream_calls": self.upstream_calls,
+        }
+
+    def close(self) -> None:
+        self.store.close()
@@ -0,0 +1,164 @@
+import os
+import importlib.util
+import logging
+from typing import Dict, Any, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional `h2` package (installed via `httpx[http2]`)
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Upstream hosts we talk to, with their pool and timeout settings.
+# Every value can be overridden with HTTP_<NAME>_<SETTING> environment
+# variables, e.g. HTTP_OPENWEATHER_MAX_CONNECTIONS=50 or HTTP_YOUTUBE_TIMEOUT=5.
+UPSTREAMS: Dict[str, Dict[str, Any]] = {
+    "openweather": {
+        "base_url": "https://api.openweathermap.org",
+        "http2": False,
+        "max_connections": 20,
+        "max_keepalive_connections": 10,
+        "timeout": 10.0,
+        "connect_timeout": 5.0,
+    },
+    "openchargemap": {
+        "base_url": "https://api.openchargemap.io",
+        "http2": False,
+        "max_connections": 10,
+        "max_keepalive_connections": 5,
+        "timeout": 15.0,
+        "connect_timeout": 5.0,
+    },
+    "alpaca": {
+        "base_url": "https://data.alpaca.markets",
+        "http2": True,
+        "max_connections": 10,
+        "max_keepalive_connections": 5,
+        "timeout": 10.0,
+        "connect_timeout": 5.0,
+    },
+    "coingecko": {
+        "base_url": "https://api.coingecko.com",
+        "http2": True,
+        "max_connections": 10,
+        "max_keepalive_connections": 5,
+        "timeout": 10.0,
+        "connect_timeout": 5.0,
+    },
+    "youtube": {
+        "base_url": "https://www.youtube.com",
+        "http2": True,
+        "max_connections": 20,
+        "max_keepalive_connections": 10,
+        "timeout": 10.0,
+        "connect_timeout": 5.0,
+    },
+    # Image generations take 10-30 seconds each
+    "stability": {
+        "base_url": "https://api.stability.ai",
+        "http2": False,
+        "max_connections": 4,
+        "max_keepalive_connections": 2,
+        "timeout": 60.0,
+        "connect_timeout": 5.0,
+    },
+    "openai": {
+        "base_url": "https://api.openai.com",
+        "http2": False,
+        "max_connections": 4,
+        "max_keepalive_connections": 2,
+        "timeout": 60.0,
+        "connect_timeout": 5.0,
+    },
+}
+
+KEEPALIVE_EXPIRY = 30.0
+
+
+def _setting(name: str, key: str, default: Any) -> Any:
+    """Read an upstream setting, letting an environment variable override it."""
+    raw = os.getenv(f"HTTP_{name.upper()}_{key.upper()}")
+    if raw is None:
+        return default
+    if isinstance(default, bool):
+        return raw.strip().lower() in ("1", "true", "yes", "on")
+    try:
+        return type(default)(raw)
+    except ValueError:
+        logger.warning(f"Ignoring invalid value for HTTP_{name.upper()}_{key.upper()}: {raw}")
+        return default
+
+
+class HTTPClientManager:
+    """
+    Owns one pooled `httpx.AsyncClient` per upstream host.
+
+    Clients are normally created by the FastAPI lifespan hook in `app.main`
+    and closed on shutdown. When the app runs without lifespan events (some
+    serverless adapters), a client is created on first use instead.
+    """
+
+    def __init__(self, upstreams: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.upstreams = upstreams if upstreams is not None else UPSTREAMS
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _build_client(self, name: str) -> httpx.AsyncClient:
+        config = self.upstreams[name]
+        http2 = _setting(name, "http2", config["http2"]) and HTTP2_AVAILABLE
+        limits = httpx.Limits(
+            max_connections=_setting(name, "max_connections", config["max_connections"]),
+            max_keepalive_connections=_setting(name, "max_keepalive_connections", config["max_keepalive_connections"]),
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            _setting(name, "timeout", config["timeout"]),
+            connect=_setting(name, "connect_timeout", config["connect_timeout"]),
+        )
+        logger.info(f"Creating HTTP client for {name} (http2={http2}, max_connections={limits.max_connections})")
+        return httpx.AsyncClient(
+            base_url=config["base_url"],
+            http2=http2,
+            limits=limits,
+            timeout=timeout,
+            headers=config.get("headers"),
+        )
+
+    def start(self) -> None:
+        """Create the clients for every configured upstream."""
+        for name in self.upstreams:
+            self.get(name)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """
+        Get the shared client for an upstream.
+
+        Args:
+            name: Upstream name (a key of `UPSTREAMS`)
+
+        Returns:
+            The pooled client for that upstream
+
+        Raises:
+            KeyError: If the upstream is not configured
+        """
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            if name not in self.upstreams:
+                raise KeyError(f"Unknown upstream: {name}")
+            client = self._build_client(name)
+            self._clients[name] = client
+        return client
+
+    async def aclose(self) -> None:
+        """Close every client and drop its connection pool."""
+        clients, self._clients = self._clients, {}
+        for name, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Error closing HTTP client for {name}: {str(e)}")
+
+
+# Process-wide manager shared by all services
+http_clients = HTTPClientManager()
@@ -0,0 +1,105 @@
+"""
+Smaller encodings of generated images.
+
+Every stored PNG gets WebP (and AVIF, when Pillow was built with it)
+versions plus small thumbnails, written next to the original. They look
+the same as the PNG but are several times smaller, which matters on
+mobile. Encoding is CPU-bound, so `make_derivatives` is meant to run in a
+worker process; it only imports Pillow once it runs there.
+
+Pillow is optional: without it images are only served as PNG.
+"""
+import os
+import tempfile
+import importlib.util
+from typing import Any, BinaryIO, Callable, Dict, List
+
+PILLOW_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+# Encoder options per derivative format
+ENCODERS: Dict[str, Dict[str, Any]] = {
+    "png": {"format": "PNG", "optimize": True},
+    "webp": {"format": "WEBP", "quality": 82, "method": 4},
+    "avif": {"format": "AVIF", "quality": 60},
+}
+
+MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "avif": "image/avif",
+}
+
+
+def available_formats() -> List[str]:
+    """Compressed formats this Pillow build can encode, best first."""
+    if not PILLOW_AVAILABLE:
+        return []
+    from PIL import features
+    formats = []
+    for fmt in ("avif", "webp"):
+        try:
+            if features.check(fmt):
+                formats.append(fmt)
+        except ValueError:
+            # Older Pillow versions do not know the feature at all
+            pass
+    return formats
+
+
+def variant_name(digest: str, fmt: str, thumbnail: bool = False) -> str:
+    """File name of one encoding of a stored image, e.g. <hash>-thumb.webp."""
+    return f"{digest}{'-thumb' if thumbnail else ''}.{fmt}"
+
+
+def make_derivatives(directory: str, digest: str, formats: List[str], thumbnail_size: int) -> Dict[str, int]:
+    """
+    Write the derivatives of a stored PNG that do not exist yet.
+
+    Args:
+        directory: Image store directory
+        digest: Content hash of the original image
+        formats: Compressed formats to produce
+        thumbnail_size: Largest side of the thumbnails, in pixels
+
+    Returns:
+        Size in bytes of every file written, by file name
+    """
+    from PIL import Image
+
+    written: Dict[str, int] = {}
+    with Image.open(os.path.join(directory, variant_name(digest, "png"))) as image:
+        image.load()
+        thumbnail = image.copy()
+        thumbnail.thumbnail((thumbnail_size, thumbnail_size), Image.LANCZOS)
+
+        targets = [(image, fmt, False) for fmt in formats]
+        # Thumbnails also get a PNG for clients that accept nothing better
+        targets += [(thumbnail, fmt, True) for fmt in ["png"] + formats]
+        for source, fmt, is_thumbnail in targets:
+            name = variant_name(digest, fmt, is_thumbnail)
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                continue
+            write_atomically(path, lambda f: source.save(f, **ENCODERS[fmt]))
+            written[name] = os.path.getsize(path)
+    return written
+
+
+def write_atomically(path: str, write: Callable[[BinaryIO], None]) -> None:
+    """
+    Write a file through a temporary file in the same directory, so readers
+    never see a partial image.
+
+    Args:
+        path: Final file path
+        write: Writes the content to the open temporary file
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
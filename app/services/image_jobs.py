@@ -0,0 +1,28 @@
+from typing import Any, Dict, Optional
+from app.services.job_queue import JobQueue
+from app.services.flux_service import FluxService
+from app.services.registry import services
+
+class ImageJobQueue(JobQueue):
+    """Background image generations, one job per distinct prompt at a time."""
+
+    def __init__(self, image_service: Optional[FluxService] = None):
+        # Stability AI calls are capped by FluxService itself, so the extra
+        # workers only let stored prompts finish without waiting behind them
+        super().__init__("images", workers=4, max_depth=100, job_timeout=180)
+        self.image_service = image_service or services.get(FluxService)
+
+    def dedupe_key(self, prompt: str, allow_similar: bool = True) -> str:
+        key = self.image_service.request_key(prompt)
+        return key if allow_similar else f"{key}:exact"
+
+    async def run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        # Failures fail the job instead of finishing it with a placeholder
+        image_url = await self.image_service.generate_image(
+            payload["prompt"], allow_similar=payload.get("allow_similar", True), raise_on_error=True
+        )
+        return {
+            "image_url": image_url,
+            "thumbnail_url": self.image_service.store.thumbnail_url(image_url),
+            "prompt": payload["prompt"]
+        }
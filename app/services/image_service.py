@@ -1,11 +1,18 @@
 import os
-import openai
+import asyncio
 from typing import Optional
+from app.services.http_client import HTTPClientManager, http_clients as default_http_clients
+from app.services.image_store import ImageStore
+from app.services.registry import services
 
 class ImageService:
-    def __init__(self):
+    def __init__(self, store: Optional[ImageStore] = None, http_clients: Optional[HTTPClientManager] = None):
         self.api_key = os.getenv("OPENAI_API_KEY")
-        openai.api_key = self.api_key
+        self.http_clients = http_clients or default_http_clients
+        # Generations in flight at once
+        self.limit = asyncio.Semaphore(max(1, int(os.getenv("IMAGE_OPENAI_CONCURRENCY", 2))))
+        # Generated images, keyed by prompt and parameters
+        self.store = store or services.get(ImageStore)
         
     async def generate_image(self, prompt: str) -> Optional[str]:
         """
@@ -15,26 +22,39 @@ class ImageService:
             prompt: Text prompt describing the image to generate
             
         Returns:
-            URL of the generated image, or None if generation failed
-            
-        Raises:
-            Exception: If image generation fails
+            URL of the generated image, served from the image store, or a
+            placeholder URL if generation failed
         """
         try:
             # Ensure the prompt is safe and appropriate
             safe_prompt = self._sanitize_prompt(prompt)
+            payload = {
+                "prompt": safe_prompt,
+                "n": 1,  # Generate 1 image
+                "size": "512x512",  # Medium size for faster generation
+                # DALL-E URLs expire after an hour, so keep the image itself
+                "response_format": "b64_json"
+            }
             
-            # Generate image using DALL-E
-            response = openai.Image.create(
-                prompt=safe_prompt,
-                n=1,  # Generate 1 image
-                size="512x512"  # Medium size for faster generation
-            )
+            # Serve a prompt that was generated before straight from the store
+            key = self.store.key(safe_prompt, {"engine": "dall-e", "size": payload["size"]})
+            digest = await self.store.lookup(key)
+            if digest is not None:
+                return self.store.url(digest)
             
-            # Extract image URL from response
-            image_url = response['data'][0]['url']
+            # Generate image using DALL-E
+            client = self.http_clients.get("openai")
+            async with self.limit:
+                response = await client.post(
+                    "/v1/images/generations",
+                    json=payload,
+                    headers={"Authorization": f"Bearer {self.api_key}"}
+                )
+            response.raise_for_status()
             
-            return image_url
+            # Store the base64 encoded image
+            digest = await self.store.put_base64(key, response.json()['data'][0]['b64_json'])
+            return self.store.url(digest)
             
         except Exception as e:
             print(f"Error generating image: {str(e)}")
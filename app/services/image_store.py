@@ -0,0 +1,276 @@
+"""
+Content-addressed store for generated images.
+
+Image files are named after the SHA-256 of their bytes, so a URL always
+points at the same content and can be cached forever by browsers and CDNs.
+A separate index maps a generation request (normalized prompt plus
+generation parameters) to the hash of the image it produced, so repeating
+a prompt is answered from disk instead of paying for another generation.
+
+Each PNG also gets WebP/AVIF versions and thumbnails (see
+`image_derivatives`), made in a process pool after it is stored. `choose`
+picks the smallest one a client accepts, falling back to the PNG until
+they are ready.
+"""
+import os
+import re
+import json
+import base64
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.services.cache import TTLCache, SQLiteCache, data_path
+from app.services.executor import run_blocking
+from app.services.image_derivatives import MEDIA_TYPES, available_formats, make_derivatives, variant_name, write_atomically
+
+logger = logging.getLogger(__name__)
+
+# URL prefix the stored images are served from
+URL_PREFIX = "/static/generated"
+
+DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+def accepted_types(accept: str) -> Set[str]:
+    """Media types listed in an Accept header, without those refused with q=0."""
+    types = set()
+    for item in accept.split(","):
+        media_type, _, params = item.strip().partition(";")
+        quality = re.search(r"q=([0-9.]+)", params)
+        if quality is not None and _quality(quality.group(1)) == 0:
+            continue
+        types.add(media_type.strip().lower())
+    return types
+
+
+def _quality(value: str) -> float:
+    """Weight of an Accept q parameter; malformed values such as "." count as 1."""
+    try:
+        return float(value)
+    except ValueError:
+        return 1.0
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase a prompt and collapse its whitespace, so trivial variations share an image."""
+    return " ".join(prompt.lower().split())
+
+
+class ImageStore:
+    def __init__(self, directory: Optional[str] = None, index_path: Optional[str] = None):
+        """
+        Args:
+            directory: Where image files are written (defaults to `generated/`
+                in the data directory)
+            index_path: SQLite file of the request index
+        """
+        self.directory = directory or data_path("generated")
+        os.makedirs(self.directory, exist_ok=True)
+        self.index = SQLiteCache(index_path or data_path("images.sqlite3"), "images")
+        self.memory = TTLCache(max_entries=int(os.getenv("IMAGE_INDEX_MEMORY_ENTRIES", 1024)))
+        # Derivative settings; no formats means Pillow is missing
+        self.formats = available_formats()
+        self.thumbnail_size = int(os.getenv("IMAGE_THUMBNAIL_SIZE", 128))
+        self.derivative_workers = max(1, int(os.getenv("IMAGE_DERIVATIVE_WORKERS", 2)))
+        self._pool: Optional[Executor] = None
+        self._deriving: Dict[str, asyncio.Future] = {}
+        # Images whose derivatives failed; not retried until restart
+        self._underivable: Set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.bytes_written = 0
+        self.derivatives_made = 0
+        self.derivative_bytes = 0
+        self.derivative_errors = 0
+        self.served: Dict[str, int] = {}
+
+    def key(self, prompt: str, params: Dict[str, Any]) -> str:
+        """
+        Index key of a generation request.
+
+        Args:
+            prompt: Prompt sent to the model
+            params: Every other parameter that changes the output (model,
+                size, steps, ...)
+
+        Returns:
+            Hex digest of the normalized prompt and the parameters
+        """
+        request = [normalize_prompt(prompt), params]
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def path(self, digest: str) -> str:
+        """File path of a stored image."""
+        return os.path.join(self.directory, f"{digest}.png")
+
+    def url(self, digest: str) -> str:
+        """URL a stored image is served from."""
+        return f"{URL_PREFIX}/{digest}.png"
+
+    def thumbnail_url(self, url: str) -> Optional[str]:
+        """URL of the thumbnail of a stored image URL, or None for other URLs."""
+        if not url.startswith(URL_PREFIX + "/") or not url.endswith(".png"):
+            return None
+        return url[:-len(".png")] + "-thumb.png"
+
+    def exists(self, digest: str) -> bool:
+        return bool(DIGEST.match(digest)) and os.path.isfile(self.path(digest))
+
+    def choose(self, digest: str, accept: str, thumbnail: bool = False) -> Tuple[str, str]:
+        """
+        Pick the encoding of a stored image to send to a client.
+
+        Args:
+            digest: Content hash of the original image
+            accept: The client's Accept header
+            thumbnail: Whether the thumbnail was requested
+
+        Returns:
+            Tuple of (file name, format). The PNG original when no smaller
+            encoding is accepted or ready yet.
+        """
+        types = accepted_types(accept)
+        for fmt in self.formats:
+            name = variant_name(digest, fmt, thumbnail)
+            if MEDIA_TYPES[fmt] in types and os.path.isfile(os.path.join(self.directory, name)):
+                return self._serve(name, fmt)
+        if thumbnail and os.path.isfile(os.path.join(self.directory, variant_name(digest, "png", True))):
+            return self._serve(variant_name(digest, "png", True), "png")
+        return self._serve(variant_name(digest, "png"), "png")
+
+    def _serve(self, name: str, fmt: str) -> Tuple[str, str]:
+        self.served[fmt] = self.served.get(fmt, 0) + 1
+        return name, fmt
+
+    def has_derivatives(self, digest: str) -> bool:
+        return not self.formats or os.path.isfile(
+            os.path.join(self.directory, variant_name(digest, self.formats[-1], True))
+        )
+
+    def derive(self, digest: str) -> Optional[asyncio.Future]:
+        """
+        Start making the derivatives of a stored image in the background.
+
+        Returns:
+            The running task (shared with concurrent calls for the same
+            image), or None when there is nothing to do
+        """
+        if digest in self._underivable or self.has_derivatives(digest):
+            return None
+        task = self._deriving.get(digest)
+        if task is None:
+            task = asyncio.ensure_future(self._derive(digest))
+            self._deriving[digest] = task
+            task.add_done_callback(lambda _: self._deriving.pop(digest, None))
+        return task
+
+    async def _derive(self, digest: str) -> None:
+        args = (self.directory, digest, self.formats, self.thumbnail_size)
+        pool = self._process_pool()
+        try:
+            if pool is not None:
+                written = await asyncio.get_running_loop().run_in_executor(pool, make_derivatives, *args)
+            else:
+                written = await run_blocking("storage", make_derivatives, *args)
+        except BrokenProcessPool as e:
+            # A worker died (out of memory, crash); the next image gets a fresh
+            # pool and this one is retried on a later request
+            self.derivative_errors += 1
+            logger.error(f"Image derivative worker died while encoding {digest}: {str(e)}")
+            if pool is self._pool:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            return
+        except Exception as e:
+            self.derivative_errors += 1
+            self._underivable.add(digest)
+            logger.error(f"Error making derivatives of image {digest}: {str(e)}")
+            return
+        self.derivatives_made += len(written)
+        self.derivative_bytes += sum(written.values())
+
+    def _process_pool(self) -> Optional[Executor]:
+        """Worker processes for encoding, or None where they cannot be started (some serverless hosts)."""
+        if self._pool is None:
+            try:
+                # Spawned, not forked: the server process holds threads and open connections
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.derivative_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"Making image derivatives in threads, no process pool: {str(e)}")
+                self._pool = False
+        return self._pool or None
+
+    async def lookup(self, key: str) -> Optional[str]:
+        """
+        Hash of the image stored for a generation request. The request index
+        is read on the storage executor.
+
+        Returns:
+            Content hash, or None when the request was never stored or its
+            file has since been removed
+        """
+        digest = self.memory.get(key)
+        if digest is None:
+            stored = await run_blocking("storage", self.index.get, key)
+            digest = stored[0] if stored is not None else None
+        if digest is None or not self.exists(digest):
+            self.misses += 1
+            return None
+        self.memory.set(key, digest)
+        self.hits += 1
+        return digest
+
+    async def put_base64(self, key: str, data: str) -> str:
+        """
+        Store a base64 encoded image for a generation request.
+
+        Decoding and writing run on the storage executor, off the event loop.
+
+        Returns:
+            Content hash of the image
+        """
+        digest = await run_blocking("storage", self._write_base64, data)
+        self.memory.set(key, digest)
+        await run_blocking("storage", self.index.set, key, digest)
+        self.derive(digest)
+        return digest
+
+    def _write_base64(self, data: str) -> str:
+        content = base64.b64decode(data)
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path):
+            # Same bytes already stored
+            return digest
+        write_atomically(path, lambda f: f.write(content))
+        self.stored += 1
+        self.bytes_written += len(content)
+        return digest
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "bytes_written": self.bytes_written,
+            "formats": self.formats,
+            "derivatives_made": self.derivatives_made,
+            "derivative_bytes": self.derivative_bytes,
+            "derivative_errors": self.derivative_errors,
+            "served": dict(self.served),
+        }
+
+    def close(self) -> None:
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+        self.index.close()
@@ -0,0 +1,440 @@
+"""
+In-process background job queue with a SQLite-backed job table.
+
+Work that can outlast a request (long video summaries, image generation)
+is submitted as a job: the caller gets a job ID right away and polls or
+subscribes for the result while a bounded pool of asyncio workers
+processes the queue. Jobs with the same dedupe key share one job while it
+is queued or running. Once `max_depth` jobs are waiting, new submissions
+are shed with `QueueFullError` instead of piling up.
+
+Job records are written to a local SQLite file so that results can still
+be read after the in-memory copy is gone. No external broker is needed.
+Jobs left queued or running by a stopped process are marked as failed on
+the next start, once they are older than the job timeout, rather than
+re-run, because several processes may share the file.
+
+Subclasses implement `run(payload)`; sizes can be tuned with
+JOBS_<NAME>_WORKERS and JOBS_<NAME>_MAX_DEPTH environment variables.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+
+from app.services.cache import TTLCache, connect_sqlite, data_path
+from app.services.executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+# Seconds between SSE keep-alive comments while a job is unchanged
+KEEPALIVE_INTERVAL = 15
+
+T = TypeVar("T")
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job queue is at its maximum depth and a job is shed."""
+
+
+def job_response(job: Dict[str, Any], model: Type[T]) -> T:
+    """Build an API response model (a JobResponse subclass) from a job snapshot."""
+    return model(
+        job_id=job["id"],
+        status=job["status"],
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        result=job["result"],
+        error=job["error"]
+    )
+
+
+class JobStore:
+    """Job records for every queue, in one SQLite table."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.enabled = True
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None or not self.enabled:
+            return self._conn
+        self._conn = connect_sqlite(self.path, [
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, queue TEXT NOT NULL, status TEXT NOT NULL, "
+            "payload TEXT, result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL)",
+            "CREATE INDEX IF NOT EXISTS jobs_queue_status ON jobs (queue, status)",
+        ], "job store")
+        self.enabled = self._conn is not None
+        return self._conn
+
+    def save(self, queue: str, job: Dict[str, Any]) -> None:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO jobs "
+                    "(id, queue, status, payload, result, error, created_at, started_at, finished_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        job["id"], queue, job["status"], json.dumps(job["payload"]),
+                        json.dumps(job["result"]), job["error"],
+                        job["created_at"], job["started_at"], job["finished_at"],
+                    )
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Job store write failed for {job['id']}: {str(e)}")
+
+    def load(self, queue: str, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT id, status, payload, result, error, created_at, started_at, finished_at "
+                    "FROM jobs WHERE queue = ? AND id = ?",
+                    (queue, job_id)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Job store read failed for {job_id}: {str(e)}")
+                return None
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "status": row[1],
+            "payload": json.loads(row[2]) if row[2] else None,
+            "result": json.loads(row[3]) if row[3] else None,
+            "error": row[4],
+            "created_at": row[5],
+            "started_at": row[6],
+            "finished_at": row[7],
+        }
+
+    def fail_unfinished(self, queue: str, created_before: float, error: str) -> int:
+        """Mark unfinished jobs created before `created_before` as failed."""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return 0
+            try:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                    "WHERE queue = ? AND status IN (?, ?) AND created_at < ?",
+                    (FAILED, error, time.time(), queue, QUEUED, RUNNING, created_before)
+                )
+                conn.commit()
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                logger.warning(f"Job store update failed for {queue}: {str(e)}")
+                return 0
+
+    def purge(self, queue: str, finished_before: float) -> int:
+        """Delete finished jobs older than `finished_before`."""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return 0
+            try:
+                cursor = conn.execute(
+                    "DELETE FROM jobs WHERE queue = ? AND status IN (?, ?) AND finished_at < ?",
+                    (queue, SUCCEEDED, FAILED, finished_before)
+                )
+                conn.commit()
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                logger.warning(f"Job store purge failed for {queue}: {str(e)}")
+                return 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobQueue(ABC):
+    """
+    Bounded queue of jobs processed by a fixed number of asyncio workers.
+
+    Workers start on the first submission, so the queue also works when the
+    app runs without lifespan events.
+    """
+
+    def __init__(self, name: str, workers: int = 2, max_depth: int = 100,
+                 job_timeout: Optional[float] = None, store: Optional[JobStore] = None):
+        """
+        Args:
+            name: Queue name, used for its records and settings
+            workers: Jobs processed at the same time
+            max_depth: Queued jobs allowed before new ones are shed
+            job_timeout: Seconds after which a running job fails
+            store: Job record store (defaults to jobs.sqlite3 in the data directory)
+        """
+        key = name.upper()
+        self.name = name
+        self.workers = max(1, int(os.getenv(f"JOBS_{key}_WORKERS", workers)))
+        self.max_depth = max(0, int(os.getenv(f"JOBS_{key}_MAX_DEPTH", max_depth)))
+        self.job_timeout = float(os.getenv(f"JOBS_{key}_TIMEOUT", job_timeout or 600))
+        self.result_ttl = float(os.getenv("JOBS_RESULT_TTL", 3600))
+        self.store = store or JobStore(data_path("jobs.sqlite3"))
+
+        # Queued and running jobs, plus recently finished ones for fast polling
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._finished = TTLCache(max_entries=1024, ttl=self.result_ttl)
+        self._by_key: Dict[str, str] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list = []
+        self._recovered = False
+
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.running = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+        self.max_run = 0.0
+
+    @abstractmethod
+    async def run(self, payload: Dict[str, Any]) -> Any:
+        """Process one job and return its JSON-serializable result."""
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, payload: Dict[str, Any], dedupe_key: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Queue a job, or attach to the queued or running job with the same key.
+
+        Args:
+            payload: JSON-serializable job input
+            dedupe_key: Jobs with equal keys share one job while unfinished
+
+        Returns:
+            Tuple of (job snapshot, whether a new job was created)
+
+        Raises:
+            QueueFullError: If the queue is at its maximum depth
+        """
+        await self._start()
+
+        if dedupe_key is not None and dedupe_key in self._by_key:
+            self.deduplicated += 1
+            return self._snapshot(self._jobs[self._by_key[dedupe_key]]), False
+
+        if self.depth >= self.max_depth:
+            self.rejected += 1
+            raise QueueFullError(f"The {self.name} queue is full, try again later")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "dedupe_key": dedupe_key,
+        }
+        self._jobs[job["id"]] = job
+        self._changed[job["id"]] = asyncio.Event()
+        if dedupe_key is not None:
+            self._by_key[dedupe_key] = job["id"]
+        self.submitted += 1
+        self._queue.put_nowait(job["id"])
+        await self._save(job)
+        return self._snapshot(job), True
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current state of a job, or None when it is unknown or expired."""
+        job = self._jobs.get(job_id) or self._finished.get(job_id)
+        if job is not None:
+            return self._snapshot(job)
+        return await run_blocking("storage", self.store.load, self.name, job_id)
+
+    async def watch(self, job_id: str, timeout: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Follow a job until it finishes.
+
+        Yields the current state, then the new state after every change. When
+        nothing changes for `timeout` seconds None is yielded, so callers can
+        send keep-alives. Stops after the finished state.
+        """
+        while True:
+            job = await self.get(job_id)
+            if job is None:
+                return
+            yield job
+            if job["status"] in FINISHED:
+                return
+            changed = self._changed.get(job_id)
+            if changed is None:
+                return
+            while True:
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout)
+                    break
+                except asyncio.TimeoutError:
+                    yield None
+
+    async def events(self, job_id: str, model: Type[Any],
+                     is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None) -> AsyncIterator[str]:
+        """
+        Follow a job as Server-Sent Events.
+
+        Args:
+            job_id: Job to follow
+            model: Response model each state is sent as, in a `status` event
+            is_disconnected: Checked before every event; the stream ends once
+                it returns True
+
+        Yields:
+            SSE messages, with keep-alive comments every KEEPALIVE_INTERVAL
+            seconds while the job is unchanged
+        """
+        async for job in self.watch(job_id, timeout=KEEPALIVE_INTERVAL):
+            if is_disconnected is not None and await is_disconnected():
+                return
+            if job is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: status\ndata: {job_response(job, model).model_dump_json()}\n\n"
+
+    async def _start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        if not self._recovered:
+            self._recovered = True
+            # Unfinished jobs older than the timeout cannot be running anywhere anymore
+            interrupted = await run_blocking(
+                "storage", self.store.fail_unfinished, self.name, time.time() - self.job_timeout,
+                "Interrupted by a server restart, please submit again"
+            )
+            if interrupted:
+                logger.warning(f"Marked {interrupted} interrupted {self.name} jobs as failed")
+            await run_blocking("storage", self.store.purge, self.name, time.time() - self.result_ttl)
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs[job_id]
+            job["status"] = RUNNING
+            job["started_at"] = time.time()
+            wait = job["started_at"] - job["created_at"]
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.running += 1
+            self._notify(job_id)
+            await self._save(job)
+
+            try:
+                job["result"] = await asyncio.wait_for(self.run(job["payload"]), self.job_timeout)
+                job["status"] = SUCCEEDED
+                self.succeeded += 1
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                job["status"] = FAILED
+                job["error"] = f"Job timed out after {self.job_timeout:g} seconds"
+                self.failed += 1
+            except Exception as e:
+                logger.error(f"{self.name} job {job_id} failed: {str(e)}")
+                job["status"] = FAILED
+                job["error"] = str(e)
+                self.failed += 1
+            finally:
+                self.running -= 1
+
+            job["finished_at"] = time.time()
+            elapsed = job["finished_at"] - job["started_at"]
+            self.total_run += elapsed
+            self.max_run = max(self.max_run, elapsed)
+
+            if job["dedupe_key"] is not None and self._by_key.get(job["dedupe_key"]) == job_id:
+                del self._by_key[job["dedupe_key"]]
+            self._finished.set(job_id, job)
+            del self._jobs[job_id]
+            self._notify(job_id)
+            self._changed.pop(job_id, None)
+            await self._save(job)
+
+    def _notify(self, job_id: str) -> None:
+        """Wake watchers of a job and arm a new event for its next change."""
+        changed = self._changed.get(job_id)
+        if changed is not None:
+            changed.set()
+            self._changed[job_id] = asyncio.Event()
+
+    async def _save(self, job: Dict[str, Any]) -> None:
+        try:
+            await run_blocking("storage", self.store.save, self.name, job)
+        except Exception as e:
+            # The in-memory state stays authoritative while the job is recent
+            logger.warning(f"Could not persist {self.name} job {job['id']}: {str(e)}")
+
+    def _snapshot(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in job.items() if key != "dedupe_key"}
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.succeeded + self.failed + self.running
+        finished = self.succeeded + self.failed
+        return {
+            "workers": self.workers,
+            "max_depth": self.max_depth,
+            "depth": self.depth,
+            "running": self.running,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait / started * 1000, 3) if started > 0 else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "avg_run_ms": round(self.total_run / finished * 1000, 3) if finished > 0 else 0.0,
+            "max_run_ms": round(self.max_run * 1000, 3),
+        }
+
+    async def aclose(self) -> None:
+        """Stop the workers; their unfinished jobs are marked failed on a later start."""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        # Wake watchers so they stop following jobs this queue no longer tracks
+        for changed in self._changed.values():
+            changed.set()
+        self._jobs.clear()
+        self._by_key.clear()
+        self._changed.clear()
+        self._finished.clear()
+        self._queue = None
+        self._recovered = False
+        self.store.close()
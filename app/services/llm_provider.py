@@ -0,0 +1,230 @@
+"""
+Common interface of the LLM services.
+
+`GeminiService` and `GroqService` only implement two primitives, a single
+completion and a streamed completion. The prompts and the parsing of the
+answers into points live here, so every provider (and `LLMRouter`, which
+is a provider itself) summarizes text the same way.
+"""
+import json
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+# Prompt used to summarize a text into key points. Summaries are cached under
+# a hash of the prompt templates, so editing one invalidates cached summaries.
+SUMMARY_PROMPT = """
+        Please summarize the following text into {max_points} key points. Format your response
+        as a JSON array of strings, with each string being a key point from the text.
+
+        Text to summarize{note}:
+        {text}
+
+        Response (JSON array only):
+        """
+
+# Prompt used to merge the key points of several parts of a long text
+REDUCE_PROMPT = """
+        The following key points were extracted from consecutive parts of one long text.
+        Combine them into the {max_points} most important key points of the whole text.
+        Format your response as a JSON array of strings, with each string being a key point.
+
+        Key points:
+        {points}
+
+        Response (JSON array only):
+        """
+
+SEARCH_PROMPT = """
+        Based on the following search results for the query "{query}", provide a concise answer with
+        key information points. Format your response as a JSON array of strings.
+
+        Search results:
+        {results}
+
+        Response (JSON array only):
+        """
+
+# Prompt used to answer a question from the best matching transcript passages
+QUESTION_PROMPT = """
+        Answer the question about a video using only the transcript excerpts below. Each excerpt
+        starts with its timestamp. Cite the timestamps you used, like [12:34]. If the excerpts do
+        not answer the question, say so.
+
+        Excerpts:
+        {passages}
+
+        Question: {question}
+
+        Answer:
+        """
+
+SUMMARY_SYSTEM = "You are a helpful assistant that summarizes text into key points. You respond in JSON format only."
+SEARCH_SYSTEM = "You are a helpful assistant that provides concise information based on search results. You respond in JSON format only."
+QUESTION_SYSTEM = "You are a helpful assistant that answers questions about videos from their transcripts, briefly and with timestamps."
+
+SUMMARY_FALLBACK = "Unable to summarize the video. Please try a different video or try again later."
+SEARCH_FALLBACK = "Unable to process the search results. Please try a different query or try again later."
+
+
+class LLMProvider(ABC):
+    provider_name = "llm"
+    model_name = ""
+    prompt_templates = [SUMMARY_PROMPT, REDUCE_PROMPT]
+
+    @abstractmethod
+    async def complete(self, prompt: str, system: Optional[str] = None) -> str:
+        """
+        Get the model's answer to a prompt.
+
+        Args:
+            prompt: User prompt
+            system: Optional system instruction
+
+        Returns:
+            Answer text
+
+        Raises:
+            Exception: If the model call fails
+        """
+
+    @abstractmethod
+    def stream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        """Like `complete`, but yields pieces of the answer as they are generated."""
+
+    async def summarize_text(self, text: str, max_points: int = 3) -> List[str]:
+        """
+        Summarize text into key points.
+
+        Args:
+            text: The text to summarize
+            max_points: Maximum number of key points to return
+
+        Returns:
+            List of summary points, or a fallback message if summarization fails
+        """
+        try:
+            return await self.generate_summary(text, max_points)
+        except Exception as e:
+            print(f"Error in {self.provider_name} summarization: {str(e)}")
+            # Return a fallback response
+            return [SUMMARY_FALLBACK]
+
+    async def generate_summary(self, text: str, max_points: int = 3, note: str = "") -> List[str]:
+        """
+        Summarize text into key points, raising instead of returning a fallback.
+
+        The text must fit the model's context; long transcripts are split into
+        chunks by `SummaryService` first.
+
+        Args:
+            text: The text to summarize
+            max_points: Maximum number of key points to return
+            note: Extra context appended to the prompt, e.g. " (part 2 of 5)"
+
+        Returns:
+            List of summary points
+
+        Raises:
+            Exception: If the model call fails
+        """
+        prompt = SUMMARY_PROMPT.format(max_points=max_points, note=note, text=text)
+        return self._parse_points(await self.complete(prompt, SUMMARY_SYSTEM), max_points)
+
+    async def reduce_summaries(self, points: List[str], max_points: int = 3) -> List[str]:
+        """
+        Merge key points from several parts of a text into a final summary.
+
+        Args:
+            points: Key points of the parts, in order
+            max_points: Maximum number of key points to return
+
+        Returns:
+            List of summary points
+
+        Raises:
+            Exception: If the model call fails
+        """
+        prompt = self._reduce_prompt(points, max_points)
+        return self._parse_points(await self.complete(prompt, SUMMARY_SYSTEM), max_points)
+
+    def stream_summary(self, text: str, max_points: int = 3, note: str = "") -> AsyncIterator[str]:
+        """
+        Stream the answer to the summary prompt as it is generated.
+
+        Returns:
+            Async iterator over pieces of the answer text, to be parsed with
+            `PointStreamParser`
+        """
+        prompt = SUMMARY_PROMPT.format(max_points=max_points, note=note, text=text)
+        return self.stream(prompt, SUMMARY_SYSTEM)
+
+    def stream_reduce(self, points: List[str], max_points: int = 3) -> AsyncIterator[str]:
+        """Stream the answer to the reduce prompt, like `stream_summary`."""
+        return self.stream(self._reduce_prompt(points, max_points), SUMMARY_SYSTEM)
+
+    async def process_search_results(self, query: str, search_results: List[Dict[str, Any]]) -> List[str]:
+        """
+        Extract key information from search results.
+
+        Args:
+            query: The user's original query
+            search_results: List of search result dictionaries
+
+        Returns:
+            List of processed information points
+        """
+        # Format the search results
+        formatted_results = "\n\n".join([
+            f"Title: {result.get('title', 'No title')}\n"
+            f"Snippet: {result.get('snippet', 'No snippet')}"
+            for result in search_results[:5]  # Limit to top 5 results
+        ])
+        prompt = SEARCH_PROMPT.format(query=query, results=formatted_results)
+
+        try:
+            return self._parse_points(await self.complete(prompt, SEARCH_SYSTEM))
+        except Exception as e:
+            print(f"Error in {self.provider_name} search processing: {str(e)}")
+            return [SEARCH_FALLBACK]
+
+    async def answer_question(self, question: str, passages: List[str]) -> str:
+        """
+        Answer a question from transcript passages.
+
+        Args:
+            question: The user's question
+            passages: Transcript excerpts, each prefixed with its timestamp
+
+        Returns:
+            Answer text
+
+        Raises:
+            Exception: If the model call fails
+        """
+        prompt = QUESTION_PROMPT.format(passages="\n".join(passages), question=question)
+        return (await self.complete(prompt, QUESTION_SYSTEM)).strip()
+
+    def _reduce_prompt(self, points: List[str], max_points: int) -> str:
+        return REDUCE_PROMPT.format(
+            max_points=max_points,
+            points="\n".join(f"- {point}" for point in points)
+        )
+
+    def _parse_points(self, response_text: str, max_points: Optional[int] = None) -> List[str]:
+        """Parse the model's answer into a list of points."""
+        text = response_text.strip()
+
+        # Handle the response - could be JSON or plain text
+        if text.startswith("[") and text.endswith("]"):
+            try:
+                points = json.loads(text)
+                return points[:max_points] if max_points is not None else points
+            except json.JSONDecodeError:
+                # Fall back to text processing if JSON parsing fails
+                pass
+
+        # Process as plain text if JSON parsing failed
+        lines = text.split("\n")
+        points = [line.strip().lstrip("•-*").strip() for line in lines if line.strip()]
+
+        return points[:max_points] if max_points is not None else points
@@ -0,0 +1,319 @@
+"""
+Latency-aware routing across the LLM providers.
+
+`LLMRouter` is itself an `LLMProvider`. Every completion goes to the
+fastest healthy provider, judged by a rolling window of recent latencies
+and errors. A provider that keeps failing is skipped for a cooldown
+period, and a failed call is retried on the next provider. With hedging
+enabled, a call still running after the provider's p95 latency is also
+sent to the runner-up provider and the first answer wins.
+
+Settings:
+- LLM_<PROVIDER>_CONCURRENCY: calls in flight per provider (default 4)
+- LLM_WINDOW: calls kept in the rolling window (default 100); LLM_MIN_SAMPLES:
+  calls needed before the error rate counts (5)
+- LLM_MAX_ERROR_RATE: error rate above which a provider is unhealthy (0.5),
+  until it has gone a cooldown period without failing
+- LLM_FAILURE_THRESHOLD / LLM_COOLDOWN: consecutive failures before a
+  provider is skipped, and for how many seconds (3, 30)
+- LLM_HEDGE: enable hedging (off by default); LLM_HEDGE_MIN_SAMPLES:
+  latency samples needed before hedging a provider's calls (20)
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.services.llm_provider import LLMProvider
+from app.services.gemini_service import GeminiService
+from app.services.groq_service import GroqService
+from app.services.registry import services
+
+logger = logging.getLogger(__name__)
+
+# Providers in order of preference while no latencies are known yet
+DEFAULT_PROVIDERS = [GeminiService, GroqService]
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ProviderHealth:
+    """Rolling latency and error statistics of one provider, plus its concurrency limit."""
+
+    def __init__(self, provider: LLMProvider, max_concurrency: int, window: int):
+        self.provider = provider
+        self.name = provider.provider_name
+        self.max_concurrency = max_concurrency
+        self.limit = asyncio.Semaphore(max_concurrency)
+        # Completed calls and time to first delta of streamed calls are kept
+        # apart: they measure different things and only the former drives hedging
+        self.latencies: deque = deque(maxlen=window)
+        self.stream_latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.last_failure_at = 0.0
+        self.skip_until = 0.0
+
+    def record(self, success: bool, latency: Optional[float] = None, streamed: bool = False) -> None:
+        self.calls += 1
+        self.outcomes.append(success)
+        if success:
+            self.consecutive_failures = 0
+            if latency is not None:
+                (self.stream_latencies if streamed else self.latencies).append(latency)
+        else:
+            self.errors += 1
+            self.consecutive_failures += 1
+            self.last_failure_at = time.time()
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def latency(self, fraction: float, streamed: bool = False) -> Optional[float]:
+        """
+        Latency percentile over the window, or None without samples.
+
+        Args:
+            fraction: Percentile as a fraction (0.95 for p95)
+            streamed: Time to first delta of streamed calls instead of the
+                duration of completed calls
+        """
+        latencies = self.stream_latencies if streamed else self.latencies
+        if not latencies:
+            return None
+        return _percentile(list(latencies), fraction)
+
+    @property
+    def busy(self) -> bool:
+        return self.in_flight >= self.max_concurrency
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.latency(0.5)
+        p95 = self.latency(0.95)
+        first_delta_p50 = self.latency(0.5, streamed=True)
+        return {
+            "model": self.provider.model_name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate, 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "first_delta_p50_ms": round(first_delta_p50 * 1000, 1) if first_delta_p50 is not None else None,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "skipped_until": self.skip_until if self.skip_until > time.time() else None,
+        }
+
+
+class LLMRouter(LLMProvider):
+    provider_name = "router"
+
+    def __init__(self, providers: Optional[List[LLMProvider]] = None):
+        """
+        Args:
+            providers: Providers to route between (defaults to every provider
+                that can be built, see `DEFAULT_PROVIDERS`)
+        """
+        if providers is None:
+            providers = self._build_providers()
+        window = int(os.getenv("LLM_WINDOW", 100))
+        self.health = [
+            ProviderHealth(
+                provider,
+                max(1, int(os.getenv(f"LLM_{provider.provider_name.upper()}_CONCURRENCY", 4))),
+                window
+            )
+            for provider in providers
+        ]
+        self.model_name = "+".join(f"{p.provider_name}:{p.model_name}" for p in providers)
+        self.max_error_rate = float(os.getenv("LLM_MAX_ERROR_RATE", 0.5))
+        self.min_samples = int(os.getenv("LLM_MIN_SAMPLES", 5))
+        self.failure_threshold = int(os.getenv("LLM_FAILURE_THRESHOLD", 3))
+        self.cooldown = float(os.getenv("LLM_COOLDOWN", 30))
+        self.hedge = os.getenv("LLM_HEDGE", "false").strip().lower() in ("1", "true", "yes", "on")
+        self.hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+        self.fallbacks = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _build_providers(self) -> List[LLMProvider]:
+        providers = []
+        for provider_type in DEFAULT_PROVIDERS:
+            try:
+                providers.append(services.get(provider_type))
+            except Exception as e:
+                # Usually a missing API key; route around the provider
+                logger.warning(f"LLM provider {provider_type.__name__} is unavailable: {str(e)}")
+        return providers
+
+    def _healthy(self, health: ProviderHealth, now: float) -> bool:
+        if health.skip_until > now:
+            return False
+        if len(health.outcomes) < self.min_samples or health.error_rate <= self.max_error_rate:
+            return True
+        # Give a provider with a bad record another chance once it has stopped failing for a while
+        return now - health.last_failure_at >= self.cooldown
+
+    def ranked(self, streamed: bool = False) -> List[ProviderHealth]:
+        """
+        Providers in the order they should be tried.
+
+        Healthy providers come first, those with free capacity before busy
+        ones, then by median latency (providers without samples first, so
+        they get measured): of completed calls, or time to first delta when
+        ranking for a stream. Unhealthy providers are kept as a last resort.
+        """
+        now = time.time()
+        healthy = [h for h in self.health if self._healthy(h, now)]
+        unhealthy = [h for h in self.health if not self._healthy(h, now)]
+        healthy.sort(key=lambda h: (h.busy, h.latency(0.5, streamed) or 0.0))
+        return healthy + unhealthy
+
+    async def _call(self, health: ProviderHealth, prompt: str, system: Optional[str]) -> str:
+        async with health.limit:
+            health.in_flight += 1
+            started = time.perf_counter()
+            try:
+                result = await health.provider.complete(prompt, system)
+            except asyncio.CancelledError:
+                # Lost a hedge race, which says nothing about the provider
+                raise
+            except Exception:
+                self._record_failure(health)
+                raise
+            else:
+                health.record(True, time.perf_counter() - started)
+                return result
+            finally:
+                health.in_flight -= 1
+
+    def _record_failure(self, health: ProviderHealth) -> None:
+        health.record(False)
+        if health.consecutive_failures >= self.failure_threshold:
+            health.skip_until = time.time() + self.cooldown
+            logger.warning(f"Skipping LLM provider {health.name} for {self.cooldown:g}s after repeated failures")
+
+    async def complete(self, prompt: str, system: Optional[str] = None) -> str:
+        """
+        Get an answer from the best available provider.
+
+        Raises:
+            RuntimeError: If no provider is configured
+            Exception: The last provider error when every provider failed
+        """
+        candidates = self.ranked()
+        if not candidates:
+            raise RuntimeError("No LLM provider is available")
+
+        primary, others = candidates[0], candidates[1:]
+        deadline = primary.latency(0.95) if len(primary.latencies) >= self.hedge_min_samples else None
+        if self.hedge and others and deadline is not None:
+            try:
+                return await self._hedged(primary, others[0], deadline, prompt, system)
+            except Exception as e:
+                last_error = e
+            others = others[1:]
+        else:
+            try:
+                return await self._call(primary, prompt, system)
+            except Exception as e:
+                last_error = e
+
+        for health in others:
+            self.fallbacks += 1
+            logger.warning(f"Retrying LLM call on {health.name}: {str(last_error)}")
+            try:
+                return await self._call(health, prompt, system)
+            except Exception as e:
+                last_error = e
+        raise last_error
+
+    async def _hedged(self, primary: ProviderHealth, backup: ProviderHealth, deadline: float,
+                      prompt: str, system: Optional[str]) -> str:
+        """Call `primary`; if it has not answered within `deadline`, race it against `backup`."""
+        first = asyncio.ensure_future(self._call(primary, prompt, system))
+        done, _ = await asyncio.wait({first}, timeout=deadline)
+        if done:
+            if first.exception() is None:
+                return first.result()
+            # Failed fast: no race needed, just fall back
+            self.fallbacks += 1
+            return await self._call(backup, prompt, system)
+
+        self.hedges += 1
+        second = asyncio.ensure_future(self._call(backup, prompt, system))
+        pending = {first, second}
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream an answer from the best available provider.
+
+        A provider that fails before sending anything is replaced by the next
+        one; once text has been sent, errors are raised to the caller.
+        """
+        candidates = self.ranked(streamed=True)
+        if not candidates:
+            raise RuntimeError("No LLM provider is available")
+
+        last_error: Optional[Exception] = None
+        for index, health in enumerate(candidates):
+            if index > 0:
+                self.fallbacks += 1
+            sent = False
+            # Time to the first delta: the rest of the stream is paced by the
+            # caller and the answer length, not by the provider's load
+            first_delta: Optional[float] = None
+            async with health.limit:
+                health.in_flight += 1
+                started = time.perf_counter()
+                try:
+                    async for delta in health.provider.stream(prompt, system):
+                        if first_delta is None:
+                            first_delta = time.perf_counter() - started
+                        sent = True
+                        yield delta
+                except Exception as e:
+                    self._record_failure(health)
+                    if sent:
+                        raise
+                    last_error = e
+                    continue
+                else:
+                    health.record(True, first_delta, streamed=True)
+                    return
+                finally:
+                    health.in_flight -= 1
+        raise last_error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "providers": {health.name: health.stats() for health in self.health},
+            "fallbacks": self.fallbacks,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
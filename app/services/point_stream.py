@@ -0,0 +1,144 @@
+"""
+Incremental parser for summary points streamed by an LLM.
+
+The summarize prompts ask for a JSON array of strings. While the model is
+still streaming, each string is emitted as soon as its closing quote
+arrives, so the client can show the first point long before the answer is
+complete. Answers that are not a JSON array are split into one point per
+line, like the non-streaming parser does.
+"""
+import json
+from typing import List, Optional
+
+
+def _clean_line(line: str) -> str:
+    return line.strip().lstrip("•-*").strip()
+
+
+class PointStreamParser:
+    def __init__(self, max_points: Optional[int] = None):
+        """
+        Args:
+            max_points: Most points emitted, in JSON and line mode alike
+        """
+        self.max_points = max_points
+        self.mode: Optional[str] = None
+        self.points: List[str] = []
+        self._buffer = ""
+        self._in_string = False
+        self._escaped = False
+        self._scanned = 0
+        self._closed = False
+
+    def feed(self, delta: str) -> List[str]:
+        """
+        Add streamed text.
+
+        Returns:
+            Points completed by this text
+        """
+        self._buffer += delta
+        return self._drain(final=False)
+
+    def close(self) -> List[str]:
+        """
+        Finish the stream.
+
+        Returns:
+            Points left in the buffer
+        """
+        return self._drain(final=True)
+
+    def _emit(self, candidates: List[str]) -> List[str]:
+        emitted = []
+        for point in candidates:
+            if self.max_points is not None and len(self.points) >= self.max_points:
+                break
+            self.points.append(point)
+            emitted.append(point)
+        return emitted
+
+    def _drain(self, final: bool) -> List[str]:
+        if self.mode is None and not self._detect_mode(final):
+            return []
+        if self.mode == "json":
+            return self._emit(self._drain_json(final))
+        return self._emit(self._drain_lines(final))
+
+    def _detect_mode(self, final: bool) -> bool:
+        """Decide between JSON and line mode from the first characters."""
+        stripped = self._buffer.lstrip()
+        if stripped and "```".startswith(stripped) and not final:
+            # Could still become a code fence
+            return False
+        if stripped.startswith("```"):
+            # Skip a Markdown code fence such as ```json
+            if "\n" not in stripped:
+                if final:
+                    self._buffer = ""
+                return False
+            stripped = stripped.split("\n", 1)[1].lstrip()
+        if not stripped:
+            self._buffer = stripped
+            return False
+        if stripped.startswith("["):
+            self.mode = "json"
+            self._buffer = stripped[1:]
+        else:
+            self.mode = "lines"
+            self._buffer = stripped
+        return True
+
+    def _drain_json(self, final: bool) -> List[str]:
+        points = []
+        buffer = self._buffer
+        start = 0 if self._in_string else None
+        index = self._scanned
+        while index < len(buffer) and not self._closed:
+            char = buffer[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    points.append(self._decode(buffer[start:index + 1]))
+                    start = None
+            elif char == '"':
+                self._in_string = True
+                start = index
+            elif char == "]":
+                self._closed = True
+            index += 1
+
+        if self._in_string:
+            if final:
+                # Unterminated last string
+                points.append(self._decode(buffer[start:] + '"'))
+                self._buffer = ""
+                self._scanned = 0
+            else:
+                # Keep the open string, rescan only what is new
+                self._buffer = buffer[start:]
+                self._scanned = index - start
+        else:
+            self._buffer = ""
+            self._scanned = 0
+        return [point for point in points if point]
+
+    def _decode(self, literal: str) -> str:
+        try:
+            return json.loads(literal).strip()
+        except ValueError:
+            return literal.strip('"').strip()
+
+    def _drain_lines(self, final: bool) -> List[str]:
+        lines = self._buffer.split("\n")
+        self._buffer = "" if final else lines.pop()
+        points = []
+        for line in lines:
+            point = _clean_line(line)
+            if point and not point.startswith("```"):
+                points.append(point)
+        return points
@@ -0,0 +1,261 @@
+"""
+Near-duplicate lookup of image prompts.
+
+Users often ask for nearly the same image in different words ("a cat in
+space", "cat in outer space!"). `PromptIndex` reduces each prompt to its
+content words and finds an earlier prompt whose words are similar enough
+(Jaccard similarity at or above the threshold), so its stored image can be
+served instead of paying for a new generation.
+
+Two prompts never match when they:
+- differ in their negations or prepositions ("a cat with a hat" and "a
+  cat without a hat", "a red car" and "a red car at night"), which change
+  what is shown without adding many words
+- share their words in a different order ("a dog chasing a cat" and "a
+  cat chasing a dog")
+
+Prompts with a single content word only match the same prompt.
+
+    >>> index = PromptIndex(threshold=0.65)
+    >>> index.add("sdxl", "a cat in space", "digest")
+    >>> index.find("sdxl", "cat in outer space!")
+    ('digest', 0.6666666666666666)
+    >>> index.add("sdxl", "a red sports car driving fast", "car")
+    >>> index.find("sdxl", "red sports car driving very fast at night") is None
+    True
+
+Candidates come from MinHash signatures split into LSH bands, so a lookup
+only compares against prompts that share a band instead of every entry.
+Candidates are then checked with their exact similarity, so the threshold
+is never crossed by MinHash estimation noise.
+
+Settings:
+- IMAGE_SIMILARITY_THRESHOLD: minimum Jaccard similarity to reuse an image
+  (default 0.65, which lets one word in three differ; 1 only reuses
+  prompts with the same words)
+- IMAGE_PROMPT_INDEX_SIZE: prompts kept, oldest dropped first (10000)
+"""
+import os
+import re
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+import numpy as np
+
+WORD = re.compile(r"[a-z0-9]+")
+
+# Words that do not change what an image shows
+STOPWORDS = frozenset("""
+a an the of in on at with and for to from by into onto some very its his her their is are
+""".split())
+
+# Negations and prepositions: a different one changes the scene, so prompts
+# only match when they have the same ones
+MARKERS = frozenset("""
+no not without never none nor in on at with by from into onto under over near behind above below
+beside inside outside during through across around between
+""".split())
+
+# Content words a prompt needs before it can match a different prompt
+MIN_FUZZY_WORDS = 2
+
+# Signature size, split into BANDS bands of NUM_PERM // BANDS rows. With 16
+# bands of 4 rows, a prompt with a similarity of 0.5 is a candidate 64% of
+# the time, 0.65 96% and 0.8 almost always.
+NUM_PERM = 64
+BANDS = 16
+
+_rng = np.random.RandomState(20240601)
+
+
+def _random_uint64(size: int) -> np.ndarray:
+    high = _rng.randint(0, 2 ** 32, size=size, dtype=np.uint64)
+    low = _rng.randint(0, 2 ** 32, size=size, dtype=np.uint64)
+    return (high << np.uint64(32)) | low
+
+
+# One random odd multiplier and offset per permutation
+_MULTIPLIERS = _random_uint64(NUM_PERM) | np.uint64(1)
+_OFFSETS = _random_uint64(NUM_PERM)
+
+
+def prompt_terms(prompt: str) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+    """
+    Terms of a prompt, lowercased.
+
+    Returns:
+        Tuple of (content words in order, without stopwords, markers and
+        plural s; markers used)
+    """
+    words = []
+    markers = set()
+    for word in WORD.findall(prompt.lower()):
+        if word in MARKERS:
+            markers.add(word)
+            continue
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return tuple(words), frozenset(markers)
+
+
+def _in_order(words: Tuple[str, ...], keep: Set[str]) -> List[str]:
+    """First occurrence of each word of `keep`, in prompt order."""
+    seen: Set[str] = set()
+    ordered = []
+    for word in words:
+        if word in keep and word not in seen:
+            seen.add(word)
+            ordered.append(word)
+    return ordered
+
+
+def similarity(a: Tuple[str, ...], b: Tuple[str, ...]) -> float:
+    """
+    Jaccard similarity of the content words of two prompts, or 0 when
+    their shared words come in a different order (swapped roles).
+    """
+    words_a, words_b = set(a), set(b)
+    if not words_a or not words_b:
+        return 0.0
+    shared = words_a & words_b
+    if _in_order(a, shared) != _in_order(b, shared):
+        return 0.0
+    return len(shared) / len(words_a | words_b)
+
+
+def minhash(words: FrozenSet[str]) -> np.ndarray:
+    """MinHash signature of a word set, one value per permutation."""
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little") for word in words],
+        dtype=np.uint64
+    )
+    # Multiply-shift hashing of the 64-bit word hashes: the uint64 arithmetic
+    # wraps around on purpose, and the high bits are a random permutation
+    with np.errstate(over="ignore"):
+        permuted = (np.outer(hashes, _MULTIPLIERS) + _OFFSETS) >> np.uint64(32)
+    return permuted.min(axis=0)
+
+
+# (namespace, content words, markers)
+EntryKey = Tuple[str, Tuple[str, ...], FrozenSet[str]]
+
+
+class PromptIndex:
+    def __init__(self, threshold: Optional[float] = None, max_entries: Optional[int] = None):
+        """
+        Args:
+            threshold: Minimum Jaccard similarity for a match
+            max_entries: Prompts kept in the index
+        """
+        self.threshold = threshold if threshold is not None else float(os.getenv("IMAGE_SIMILARITY_THRESHOLD", 0.65))
+        self.max_entries = max_entries or int(os.getenv("IMAGE_PROMPT_INDEX_SIZE", 10000))
+        self.rows = NUM_PERM // BANDS
+        # Prompt terms -> (image digest, band keys), oldest first
+        self._entries: "OrderedDict[EntryKey, Tuple[str, List[Tuple[Any, ...]]]]" = OrderedDict()
+        self._buckets: Dict[Tuple[Any, ...], Set[EntryKey]] = {}
+        self.lookups = 0
+        self.hits = 0
+        self.opt_outs = 0
+        self.evictions = 0
+
+    def _key(self, namespace: str, prompt: str) -> EntryKey:
+        words, markers = prompt_terms(prompt)
+        return namespace, words, markers
+
+    def _bands(self, key: EntryKey) -> List[Tuple[Any, ...]]:
+        # Bands are per namespace and markers, so only prompts that may match become candidates
+        namespace, words, markers = key
+        signature = minhash(frozenset(words))
+        return [
+            (namespace, markers, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(BANDS)
+        ]
+
+    def add(self, namespace: str, prompt: str, digest: str) -> None:
+        """
+        Remember the image generated for a prompt.
+
+        Args:
+            namespace: Generation settings the image was made with; prompts
+                only match within the same namespace
+            prompt: Prompt without boilerplate added by the service
+            digest: Content hash of the stored image
+        """
+        key = self._key(namespace, prompt)
+        if not key[1]:
+            return
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self._entries[key] = (digest, self._entries[key][1])
+            return
+
+        bands = self._bands(key)
+        self._entries[key] = (digest, bands)
+        for band in bands:
+            self._buckets.setdefault(band, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def find(self, namespace: str, prompt: str) -> Optional[Tuple[str, float]]:
+        """
+        Find the image of the most similar earlier prompt.
+
+        Returns:
+            Tuple of (image digest, similarity), or None when no prompt
+            reaches the threshold
+        """
+        self.lookups += 1
+        key = self._key(namespace, prompt)
+        words = key[1]
+        if not words:
+            return None
+
+        best: Optional[Tuple[str, float]] = None
+        exact = self._entries.get(key)
+        if exact is not None:
+            best = (exact[0], 1.0)
+        elif len(set(words)) >= MIN_FUZZY_WORDS:
+            candidates: Set[EntryKey] = set()
+            for band in self._bands(key):
+                candidates.update(self._buckets.get(band, ()))
+            for other in candidates:
+                if len(set(other[1])) < MIN_FUZZY_WORDS:
+                    continue
+                score = similarity(words, other[1])
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (self._entries[other][0], score)
+
+        if best is not None:
+            self.hits += 1
+        return best
+
+    def forget(self, digest: str) -> None:
+        """Drop every prompt of an image, e.g. when it is gone from the store."""
+        for key in [key for key, entry in self._entries.items() if entry[0] == digest]:
+            self._remove(key)
+
+    def _remove(self, key: EntryKey) -> None:
+        _, bands = self._entries.pop(key)
+        for band in bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            "opt_outs": self.opt_outs,
+            "evictions": self.evictions,
+        }
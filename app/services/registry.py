@@ -0,0 +1,115 @@
+"""
+Process-lifetime registry of service singletons.
+
+Services are expensive to build (API clients, password hashing contexts,
+files read from disk), so each one is built once and shared by every
+request instead of being constructed in each router dependency.
+
+Thread-safety rules:
+- `get()` may be called from any thread. A service is constructed at most
+  once, under the registry lock; later lookups are a plain dict read.
+- A registered service is shared by all concurrent requests. It must not
+  keep per-request state on `self`, and any mutable shared state it owns
+  must be guarded by the service itself (see `AuthService._lock`).
+- `override()` and `reset()` are for tests and shutdown. They swap the
+  instances out from under in-flight requests, so do not call them while
+  the app is serving traffic.
+"""
+import inspect
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ServiceRegistry:
+    def __init__(self):
+        self._factories: Dict[type, Callable[[], Any]] = {}
+        self._instances: Dict[type, Any] = {}
+        # Re-entrant so a factory can look up the services it depends on
+        self._lock = threading.RLock()
+
+    def register(self, service_type: Type[T], factory: Optional[Callable[[], T]] = None) -> None:
+        """
+        Register how to build a service.
+
+        Args:
+            service_type: Service class, also used as the lookup key
+            factory: Callable building the instance (defaults to the class itself)
+        """
+        with self._lock:
+            self._factories[service_type] = factory or service_type
+
+    def get(self, service_type: Type[T]) -> T:
+        """
+        Get the shared instance of a service, building it on first use.
+
+        Args:
+            service_type: Service class to look up
+
+        Returns:
+            The process-wide service instance
+        """
+        instance = self._instances.get(service_type)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            instance = self._instances.get(service_type)
+            if instance is None:
+                factory = self._factories.get(service_type, service_type)
+                instance = factory()
+                self._instances[service_type] = instance
+                logger.info(f"Built shared {service_type.__name__}")
+        return instance
+
+    def warm(self) -> None:
+        """Build every registered service up front, logging any that fail."""
+        for service_type in list(self._factories):
+            try:
+                self.get(service_type)
+            except Exception as e:
+                logger.error(f"Failed to build {service_type.__name__}: {str(e)}")
+
+    def override(self, service_type: Type[T], instance: T) -> None:
+        """Replace the shared instance of a service (for tests)."""
+        with self._lock:
+            self._instances[service_type] = instance
+
+    def reset(self) -> None:
+        """Drop every built instance so the next lookup builds a fresh one."""
+        with self._lock:
+            self._instances.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters from every built service that exposes a `stats()` method."""
+        result = {}
+        for service_type, instance in list(self._instances.items()):
+            stats = getattr(instance, "stats", None)
+            if callable(stats):
+                result[service_type.__name__] = stats()
+        return result
+
+    async def aclose(self) -> None:
+        """Close services that hold resources, then reset the registry."""
+        with self._lock:
+            instances = list(self._instances.values())
+            self._instances.clear()
+
+        for instance in instances:
+            close = getattr(instance, "aclose", None) or getattr(instance, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Error closing {type(instance).__name__}: {str(e)}")
+
+
+# Process-wide registry used by the router dependencies
+services = ServiceRegistry()
@@ -0,0 +1,125 @@
+"""
+Single-flight coalescing of identical in-flight upstream calls.
+
+When many users ask for the same thing at the same moment (BTC price, the
+weather in one city), only the first caller starts the upstream call; the
+others await the same future. Callers being cancelled never cancel the
+shared call for the rest, and the call itself is only cancelled once every
+caller waiting on it has gone away.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Every group by name, for /api/metrics
+_groups: Dict[str, "SingleFlight"] = {}
+
+
+class _Call:
+    __slots__ = ("task", "waiters", "detached")
+
+    def __init__(self, task: asyncio.Future, detached: bool = False):
+        self.task = task
+        self.waiters = 0
+        # Detached calls were started in the background and keep running
+        # even when no caller is waiting on them
+        self.detached = detached
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.cancelled = 0
+        _groups[name] = self
+
+    def _start(self, key: Hashable, fn: Callable[[], Awaitable[T]], detached: bool) -> _Call:
+        task = asyncio.ensure_future(fn())
+        call = _Call(task, detached)
+        self._calls[key] = call
+        self.executed += 1
+        task.add_done_callback(lambda t: self._finished(key, call))
+        return call
+
+    def _finished(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if call.task.cancelled():
+            return
+        if call.task.exception() is not None:
+            self.errors += 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `fn()` once per key among concurrent callers.
+
+        Args:
+            key: Canonical request key (e.g. ("price", "BTC"))
+            fn: Zero-argument coroutine function making the upstream call
+
+        Returns:
+            The result of the shared call (the same object for every caller)
+
+        Raises:
+            Whatever the shared call raises
+        """
+        self.calls += 1
+        call = self._calls.get(key)
+        if call is None:
+            call = self._start(key, fn, detached=False)
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.detached and not call.task.done():
+                # Every caller gave up, nobody needs the result any more
+                self.cancelled += 1
+                call.task.cancel()
+                # The task may take a while to unwind; new callers start a fresh call
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+    def launch(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """
+        Start `fn()` in the background unless a call for the key is in flight.
+
+        Returns:
+            The in-flight task for the key
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = self._start(key, fn, detached=True)
+        else:
+            call.detached = True
+        return call.task
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+        }
+
+
+def singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters of every single-flight group."""
+    return {name: group.stats() for name, group in list(_groups.items())}
@@ -0,0 +1,161 @@
+"""
+Grid-tile spatial index for EV charging stations.
+
+The world is cut into fixed-size latitude/longitude tiles. A tile is filled
+with one upstream query covering it, and only the stations inside the tile
+are kept, so tiles never overlap. A circular search is answered locally
+when every tile intersecting the circle is loaded and fresh: once a 10 km
+search has loaded its tiles, a later 5 km search in the same area needs no
+network call at all. Dense tiles whose query hits the upstream result cap
+are filled with smaller queries covering their quarters (`split_bounds`);
+tiles too dense even for those are remembered for a while (`mark_dense`),
+so searches there go straight to the upstream API.
+"""
+import math
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.cache import TTLCache
+from app.services.geo import haversine_km
+
+TileKey = Tuple[int, int]
+Bounds = Tuple[float, float, float, float]
+
+KM_PER_DEGREE_LAT = 111.32
+
+
+def covering_circle(bounds: Bounds) -> Tuple[float, float, float]:
+    """
+    Circle covering a latitude/longitude box.
+
+    Returns:
+        Tuple of (center latitude, center longitude, radius in km)
+    """
+    lat_min, lng_min, lat_max, lng_max = bounds
+    center_lat = (lat_min + lat_max) / 2
+    center_lng = (lng_min + lng_max) / 2
+    radius = max(
+        haversine_km(center_lat, center_lng, lat, lng)
+        for lat in (lat_min, lat_max)
+        for lng in (lng_min, lng_max)
+    )
+    return center_lat, center_lng, radius * 1.01
+
+
+def split_bounds(bounds: Bounds) -> List[Bounds]:
+    """The four quarters of a latitude/longitude box."""
+    lat_min, lng_min, lat_max, lng_max = bounds
+    lat_mid = (lat_min + lat_max) / 2
+    lng_mid = (lng_min + lng_max) / 2
+    return [
+        (lat_min, lng_min, lat_mid, lng_mid),
+        (lat_min, lng_mid, lat_mid, lng_max),
+        (lat_mid, lng_min, lat_max, lng_mid),
+        (lat_mid, lng_mid, lat_max, lng_max),
+    ]
+
+
+class StationTileIndex:
+    def __init__(self, tile_size: float = 0.1, ttl: float = 3600, max_tiles: int = 5000, dense_ttl: float = 3600):
+        """
+        Args:
+            tile_size: Tile edge length in degrees (0.1 is about 11 km of latitude)
+            ttl: Seconds before a loaded tile is considered stale
+            max_tiles: Tiles kept in memory before the least recently used is dropped
+            dense_ttl: Seconds a tile that could not be loaded completely is
+                not tried again
+        """
+        self.tile_size = tile_size
+        self.ttl = ttl
+        self.max_tiles = max_tiles
+        self._tiles: "OrderedDict[TileKey, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._dense = TTLCache(max_entries=max_tiles, ttl=dense_ttl)
+        self._lock = threading.Lock()
+
+    def tile_key(self, lat: float, lng: float) -> TileKey:
+        return math.floor(lat / self.tile_size), math.floor(lng / self.tile_size)
+
+    def tiles_for_circle(self, lat: float, lng: float, radius_km: float) -> List[TileKey]:
+        """Keys of every tile intersecting the bounding box of a search circle."""
+        d_lat = radius_km / KM_PER_DEGREE_LAT
+        d_lng = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+        lat_min, lng_min = self.tile_key(max(lat - d_lat, -90.0), max(lng - d_lng, -180.0))
+        lat_max, lng_max = self.tile_key(min(lat + d_lat, 90.0), min(lng + d_lng, 180.0))
+        return [
+            (i, j)
+            for i in range(lat_min, lat_max + 1)
+            for j in range(lng_min, lng_max + 1)
+        ]
+
+    def tile_bounds(self, key: TileKey) -> Bounds:
+        """Edges of a tile as (lat_min, lng_min, lat_max, lng_max)."""
+        i, j = key
+        return i * self.tile_size, j * self.tile_size, (i + 1) * self.tile_size, (j + 1) * self.tile_size
+
+    def tile_query(self, key: TileKey) -> Tuple[float, float, float]:
+        """
+        Circle covering a tile, for the upstream query that fills it.
+
+        Returns:
+            Tuple of (center latitude, center longitude, radius in km)
+        """
+        return covering_circle(self.tile_bounds(key))
+
+    def missing_tiles(self, keys: List[TileKey]) -> List[TileKey]:
+        """Tiles among `keys` that are not loaded or have gone stale, except dense ones."""
+        now = time.time()
+        with self._lock:
+            return [
+                key for key in keys
+                if (key not in self._tiles or now - self._tiles[key][0] >= self.ttl)
+                and self._dense.get(key) is None
+            ]
+
+    def mark_dense(self, key: TileKey) -> None:
+        """Remember a tile that has too many stations to load."""
+        self._dense.set(key, True)
+
+    def has_dense(self, keys: List[TileKey]) -> bool:
+        """Whether any tile among `keys` was recently found too dense to load."""
+        return any(self._dense.get(key) is not None for key in keys)
+
+    def store_tile(self, key: TileKey, stations: List[Dict[str, Any]]) -> None:
+        """Store the stations of a tile, keeping only those located inside it."""
+        inside = [
+            station for station in stations
+            if self.tile_key(station["latitude"], station["longitude"]) == key
+        ]
+        with self._lock:
+            self._tiles[key] = (time.time(), inside)
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+
+    def search(self, lat: float, lng: float, radius_km: float, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Stations within `radius_km` of a point, nearest first, from loaded tiles.
+
+        Callers should load the tiles returned by `missing_tiles` first.
+        """
+        keys = self.tiles_for_circle(lat, lng, radius_km)
+        matches = []
+        with self._lock:
+            for key in keys:
+                tile = self._tiles.get(key)
+                if tile is None:
+                    continue
+                self._tiles.move_to_end(key)
+                for station in tile[1]:
+                    distance = haversine_km(lat, lng, station["latitude"], station["longitude"])
+                    if distance <= radius_km:
+                        matches.append((distance, station))
+
+        matches.sort(key=lambda match: match[0])
+        if limit is not None:
+            matches = matches[:limit]
+        return [station for _, station in matches]
+
+    def __len__(self) -> int:
+        return len(self._tiles)
@@ -0,0 +1,21 @@
+from typing import Any, Dict, Optional
+from app.services.job_queue import JobQueue
+from app.services.summary_service import SummaryService
+from app.services.registry import services
+
+class SummaryJobQueue(JobQueue):
+    """Background video summaries, one job per (video, max_points, mode) at a time."""
+
+    def __init__(self, summary_service: Optional[SummaryService] = None):
+        super().__init__("summaries", workers=2, max_depth=100)
+        self.summary_service = summary_service or services.get(SummaryService)
+
+    @staticmethod
+    def dedupe_key(video_id: str, max_points: int, mode: str = "llm") -> str:
+        return f"{video_id}:{max_points}:{mode}"
+
+    async def run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        title, summary_points, summarizer = await self.summary_service.summarize_video(
+            payload["video_id"], payload["max_points"], mode=payload.get("mode", "llm")
+        )
+        return {"title": title, "summary": summary_points, "url": payload["url"], "summarizer": summarizer}
@@ -0,0 +1,431 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.services.cache import TTLCache, SQLiteCache, data_path
+from app.services.youtube_service import YouTubeService
+from app.services.llm_provider import LLMProvider, SUMMARY_FALLBACK
+from app.services.llm_router import LLMRouter
+from app.services.point_stream import PointStreamParser
+from app.services.transcript_cleaner import clean_segments, estimate_tokens
+from app.services.extractive_summarizer import ExtractiveSummarizer
+from app.services.executor import run_blocking
+from app.services.registry import services
+
+logger = logging.getLogger(__name__)
+
+Segments = List[Dict[str, Any]]
+
+
+def chunk_segments(segments: Segments, max_tokens: int) -> List[str]:
+    """
+    Join transcript segments into chunks of at most `max_tokens` each.
+
+    Chunks only break between segments, so no sentence fragment is split
+    across two chunks. A single segment larger than the budget becomes a
+    chunk of its own.
+
+    Args:
+        segments: Transcript segments with a "text" field, in order
+        max_tokens: Token budget per chunk
+
+    Returns:
+        List of chunk texts, in order
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for segment in segments:
+        text = segment["text"].strip()
+        if not text:
+            continue
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class SummaryService:
+    """
+    Summarizes YouTube videos and caches the results.
+
+    Summaries are cached in memory and in a local SQLite file under a key
+    made of the video ID, the LLM provider and model, a hash of the prompt
+    templates and `max_points`. Changing the model or editing a prompt
+    template therefore changes every key, so stale summaries are never
+    served; they simply age out with their TTL.
+
+    Long transcripts are summarized map-reduce style: the segments are split
+    into token-budgeted chunks that are summarized concurrently, then the
+    partial summaries are merged by a final reduce call. Wall-clock time
+    grows with the number of chunk rounds rather than with video length.
+    """
+
+    def __init__(self, youtube: Optional[YouTubeService] = None, llm: Optional[LLMProvider] = None, cache_path: Optional[str] = None):
+        self.youtube = youtube or services.get(YouTubeService)
+        self.llm = llm or services.get(LLMRouter)
+        self.ttl = float(os.getenv("SUMMARY_CACHE_TTL", 7 * 24 * 3600))
+        self.memory = TTLCache(max_entries=int(os.getenv("SUMMARY_MEMORY_ENTRIES", 512)), ttl=self.ttl)
+        self.store = SQLiteCache(cache_path or data_path("summaries.sqlite3"), "summaries")
+        self.store.purge_expired()
+        # Token budget per map chunk and the number of chunks summarized at once
+        self.chunk_tokens = int(os.getenv("SUMMARY_CHUNK_TOKENS", 6000))
+        self.map_concurrency = int(os.getenv("SUMMARY_MAP_CONCURRENCY", 4))
+        # Videos in the transcript and LLM stages at once, for batch requests
+        self.batch_fetch_concurrency = int(os.getenv("SUMMARY_BATCH_FETCH_CONCURRENCY", 8))
+        self.batch_llm_concurrency = int(os.getenv("SUMMARY_BATCH_LLM_CONCURRENCY", 4))
+        # Transcript clean-up before summarizing
+        self.clean_transcripts = os.getenv("SUMMARY_CLEAN_TRANSCRIPTS", "true").strip().lower() in ("1", "true", "yes", "on")
+        self.merge_sentences = os.getenv("SUMMARY_MERGE_SENTENCES", "false").strip().lower() in ("1", "true", "yes", "on")
+        # Seconds from the start of a summarize request, transcript fetch
+        # included, until it answers with the extractive summary instead of
+        # waiting for the LLM (the frontend gives up after 15s)
+        self.llm_deadline = float(os.getenv("SUMMARY_LLM_DEADLINE", 12))
+        self.extractive = ExtractiveSummarizer()
+        self.hits = 0
+        self.misses = 0
+        self.extractive_summaries = 0
+        self.deadline_fallbacks = 0
+        self.error_fallbacks = 0
+        self.tokens_before_cleaning = 0
+        self.tokens_after_cleaning = 0
+        self.chunks_summarized = 0
+        self.reduces = 0
+
+    def prompt_fingerprint(self) -> str:
+        """Short hash of the prompt templates the LLM summarizes with."""
+        templates = getattr(self.llm, "prompt_templates", [])
+        return hashlib.sha256("\x00".join(templates).encode("utf-8")).hexdigest()[:16]
+
+    def cache_key(self, video_id: str, max_points: int) -> str:
+        """
+        Cache key for a summary.
+
+        Args:
+            video_id: Canonical YouTube video ID
+            max_points: Number of summary points requested
+
+        Returns:
+            Hex digest identifying (video, provider/model, prompt templates, max_points)
+        """
+        parts = [
+            video_id,
+            getattr(self.llm, "provider_name", type(self.llm).__name__),
+            getattr(self.llm, "model_name", ""),
+            self.prompt_fingerprint(),
+            max_points,
+        ]
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    async def get_cached(self, video_id: str, max_points: int) -> Optional[Dict[str, Any]]:
+        """Cached {"title", "summary"} for a video, or None; the disk tier is read on the storage executor."""
+        key = self.cache_key(video_id, max_points)
+        entry = self.memory.get(key)
+        if entry is None:
+            stored = await run_blocking("storage", self.store.get, key)
+            if stored is not None:
+                entry, expires_at = stored
+                ttl = expires_at - time.time() if expires_at is not None else None
+                self.memory.set(key, entry, ttl=ttl)
+        return entry
+
+    async def set_cached(self, video_id: str, max_points: int, title: str, summary: List[str]) -> None:
+        key = self.cache_key(video_id, max_points)
+        entry = {"title": title, "summary": summary}
+        self.memory.set(key, entry)
+        await run_blocking("storage", self.store.set, key, entry, ttl=self.ttl)
+
+    async def summarize_video(self, video_id: str, max_points: int = 3, mode: str = "llm",
+                              deadline: Optional[float] = None) -> Tuple[str, List[str], str]:
+        """
+        Get the title and summary points of a video, from the cache when possible.
+
+        Args:
+            video_id: YouTube video ID
+            max_points: Number of summary points
+            mode: "llm", or "fast" for the local extractive summarizer
+            deadline: Seconds after the call starts, fetching the transcript
+                included, to wait for the LLM before answering with the
+                extractive summary instead (no limit when None)
+
+        Returns:
+            Tuple of (video title, list of summary points, "llm" or "extractive")
+
+        Raises:
+            Exception: If the transcript cannot be fetched
+        """
+        # The caller's clock is already running while the transcript is fetched
+        expires_at = time.monotonic() + deadline if deadline is not None else None
+        if mode != "fast":
+            cached = await self.get_cached(video_id, max_points)
+            if cached is not None:
+                self.hits += 1
+                return cached["title"], list(cached["summary"]), "llm"
+            self.misses += 1
+
+        # Fetch the title and the transcript concurrently
+        title, (_, segments) = await asyncio.gather(
+            self.youtube.get_video_title(video_id),
+            self.youtube.get_transcript(video_id)
+        )
+
+        if mode == "fast":
+            return title, await self.extract(segments, max_points), "extractive"
+
+        summary = asyncio.ensure_future(self.summarize_segments(segments, max_points))
+        remaining = max(0.0, expires_at - time.monotonic()) if expires_at is not None else None
+        try:
+            summary_points = await asyncio.wait_for(asyncio.shield(summary), remaining)
+        except asyncio.CancelledError:
+            # The request went away; the summary still finishes and is cached
+            summary.add_done_callback(lambda done: self._cache_late(video_id, max_points, title, done))
+            raise
+        except asyncio.TimeoutError:
+            # Answer now, and cache the LLM summary for next time once it arrives
+            self.deadline_fallbacks += 1
+            logger.warning(f"LLM summary of {video_id} missed its {deadline:g}s deadline")
+            summary.add_done_callback(lambda done: self._cache_late(video_id, max_points, title, done))
+            return title, await self.extract(segments, max_points), "extractive"
+        except Exception as e:
+            # Failed summaries are not cached
+            self.error_fallbacks += 1
+            logger.error(f"Error summarizing video {video_id}: {str(e)}")
+            return title, await self.extract(segments, max_points), "extractive"
+
+        await self.set_cached(video_id, max_points, title, summary_points)
+        return title, summary_points, "llm"
+
+    def _cache_late(self, video_id: str, max_points: int, title: str, summary: asyncio.Future) -> None:
+        if not summary.cancelled() and summary.exception() is None:
+            asyncio.ensure_future(self.set_cached(video_id, max_points, title, summary.result()))
+
+    async def extract(self, segments: Segments, max_points: int = 3) -> List[str]:
+        """Extractive summary of transcript segments, computed locally."""
+        self.extractive_summaries += 1
+        points = await run_blocking("summarizer", self.extractive.summarize, segments, max_points)
+        return points or [SUMMARY_FALLBACK]
+
+    def prepare_segments(self, segments: Segments) -> Segments:
+        """Clean raw transcript segments before they are sent to the LLM."""
+        if not self.clean_transcripts:
+            return segments
+        cleaned, report = clean_segments(segments, sentences=self.merge_sentences)
+        self.tokens_before_cleaning += report["tokens_before"]
+        self.tokens_after_cleaning += report["tokens_after"]
+        logger.info(
+            f"Cleaned transcript: {report['segments_before']} -> {report['segments_after']} segments, "
+            f"~{report['tokens_before']} -> ~{report['tokens_after']} tokens"
+        )
+        return cleaned
+
+    async def summarize_segments(self, segments: Segments, max_points: int = 3) -> List[str]:
+        """
+        Summarize transcript segments of any length.
+
+        Args:
+            segments: Transcript segments, in order
+            max_points: Number of summary points
+
+        Returns:
+            List of summary points
+
+        Raises:
+            Exception: If any model call fails
+        """
+        chunks = chunk_segments(self.prepare_segments(segments), self.chunk_tokens)
+        if len(chunks) <= 1:
+            self.chunks_summarized += 1
+            return await self.llm.generate_summary(chunks[0] if chunks else "", max_points)
+
+        points = await self._map(chunks, max_points)
+        self.reduces += 1
+        return await self.llm.reduce_summaries(points, max_points)
+
+    async def summarize_many(self, video_ids: List[str], max_points: int = 3) -> AsyncIterator[Tuple[str, Optional[Tuple[str, List[str]]], Optional[str]]]:
+        """
+        Summarize several videos, yielding each result as soon as it is ready.
+
+        Transcript downloads and LLM summarization are limited separately
+        (SUMMARY_BATCH_FETCH_CONCURRENCY and SUMMARY_BATCH_LLM_CONCURRENCY),
+        so one video's transcript can download while another is summarized.
+
+        Args:
+            video_ids: Distinct YouTube video IDs
+            max_points: Number of summary points
+
+        Yields:
+            Tuple of (video ID, (title, summary points) or None, error message or None),
+            in completion order
+        """
+        fetch_limit = asyncio.Semaphore(self.batch_fetch_concurrency)
+        summarize_limit = asyncio.Semaphore(self.batch_llm_concurrency)
+
+        async def summarize_one(video_id: str) -> Tuple[str, List[str]]:
+            cached = await self.get_cached(video_id, max_points)
+            if cached is not None:
+                self.hits += 1
+                return cached["title"], list(cached["summary"])
+            self.misses += 1
+
+            async with fetch_limit:
+                title, (_, segments) = await asyncio.gather(
+                    self.youtube.get_video_title(video_id),
+                    self.youtube.get_transcript(video_id)
+                )
+            async with summarize_limit:
+                summary_points = await self.summarize_segments(segments, max_points)
+            await self.set_cached(video_id, max_points, title, summary_points)
+            return title, summary_points
+
+        async def run(video_id: str) -> Tuple[str, Optional[Tuple[str, List[str]]], Optional[str]]:
+            try:
+                return video_id, await summarize_one(video_id), None
+            except Exception as e:
+                logger.error(f"Error summarizing video {video_id}: {str(e)}")
+                return video_id, None, str(e)
+
+        tasks = [asyncio.ensure_future(run(video_id)) for video_id in video_ids]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The client may have gone away before every video was done
+            for task in tasks:
+                task.cancel()
+
+    async def stream_video(self, video_id: str, max_points: int = 3, mode: str = "llm") -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Summarize a video, yielding events as soon as each part is known.
+
+        The title comes first, then every summary point as the model streams
+        it. For long transcripts the map stage runs first and only the final
+        reduce step is streamed. The complete summary is cached at the end.
+
+        If the LLM fails before producing a point, or in "fast" mode, the
+        points come from the extractive summarizer.
+
+        Args:
+            video_id: YouTube video ID
+            max_points: Number of summary points
+            mode: "llm", or "fast" for the local extractive summarizer
+
+        Yields:
+            ("title", {"title"}), then ("point", {"index", "point"}) for each
+            point, then ("done", {"cached", "summarizer"})
+
+        Raises:
+            Exception: If the transcript cannot be fetched or the LLM fails midway
+        """
+        if mode != "fast":
+            cached = await self.get_cached(video_id, max_points)
+            if cached is not None:
+                self.hits += 1
+                yield "title", {"title": cached["title"]}
+                for index, point in enumerate(cached["summary"]):
+                    yield "point", {"index": index, "point": point}
+                yield "done", {"cached": True, "summarizer": "llm"}
+                return
+            self.misses += 1
+
+        # The transcript download starts while the title is being fetched
+        transcript = asyncio.ensure_future(self.youtube.get_transcript(video_id))
+        try:
+            title = await self.youtube.get_video_title(video_id)
+            yield "title", {"title": title}
+            _, segments = await transcript
+        finally:
+            transcript.cancel()
+
+        parser = PointStreamParser(max_points)
+        if mode != "fast":
+            try:
+                chunks = chunk_segments(self.prepare_segments(segments), self.chunk_tokens)
+                if len(chunks) <= 1:
+                    self.chunks_summarized += 1
+                    deltas = self.llm.stream_summary(chunks[0] if chunks else "", max_points)
+                else:
+                    points = await self._map(chunks, max_points)
+                    self.reduces += 1
+                    deltas = self.llm.stream_reduce(points, max_points)
+
+                async for delta in deltas:
+                    start = len(parser.points)
+                    for i, point in enumerate(parser.feed(delta)):
+                        yield "point", {"index": start + i, "point": point}
+                start = len(parser.points)
+                for i, point in enumerate(parser.close()):
+                    yield "point", {"index": start + i, "point": point}
+            except Exception as e:
+                if parser.points:
+                    raise
+                self.error_fallbacks += 1
+                logger.error(f"Error streaming summary of {video_id}: {str(e)}")
+
+            if parser.points:
+                await self.set_cached(video_id, max_points, title, parser.points)
+                yield "done", {"cached": False, "summarizer": "llm"}
+                return
+
+        for index, point in enumerate(await self.extract(segments, max_points)):
+            yield "point", {"index": index, "point": point}
+        yield "done", {"cached": False, "summarizer": "extractive"}
+
+    async def _map(self, chunks: List[str], max_points: int) -> List[str]:
+        """Summarize chunks concurrently and shrink their points to fit one reduce call."""
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+
+        async def summarize_chunk(index: int, chunk: str) -> List[str]:
+            async with semaphore:
+                self.chunks_summarized += 1
+                return await self.llm.generate_summary(
+                    chunk, max_points, note=f" (part {index + 1} of {len(chunks)} of a longer video)"
+                )
+
+        partials = await asyncio.gather(*(summarize_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+        points = [point for partial in partials for point in partial]
+        return await self._shrink(points, max_points, semaphore)
+
+    async def _shrink(self, points: List[str], max_points: int, semaphore: asyncio.Semaphore) -> List[str]:
+        """Reduce partial points in groups until they fit the chunk budget."""
+        while estimate_tokens("\n".join(points)) > self.chunk_tokens:
+            groups = chunk_segments([{"text": point} for point in points], self.chunk_tokens)
+            if len(groups) * max_points >= len(points):
+                # Points are too long to shrink any further in groups
+                break
+
+            async def reduce_group(group: str) -> List[str]:
+                async with semaphore:
+                    self.reduces += 1
+                    summary = await self.llm.generate_summary(group, max_points)
+                    return summary[:max_points]
+
+            partials = await asyncio.gather(*(reduce_group(group) for group in groups))
+            points = [point for partial in partials for point in partial]
+
+        return points
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "extractive_summaries": self.extractive_summaries,
+            "deadline_fallbacks": self.deadline_fallbacks,
+            "error_fallbacks": self.error_fallbacks,
+            "tokens_before_cleaning": self.tokens_before_cleaning,
+            "tokens_after_cleaning": self.tokens_after_cleaning,
+            "chunks_summarized": self.chunks_summarized,
+            "reduces": self.reduces,
+            "memory": self.memory.stats(),
+        }
+
+    def close(self) -> None:
+        self.store.close()
@@ -0,0 +1,119 @@
+"""
+Transcript clean-up before summarization.
+
+Auto-generated captions repeat themselves: each segment often starts with
+the words that ended the previous one, some lines appear twice, and
+non-speech markers such as [Music] or [Applause] are mixed into the text.
+`clean_segments` removes all of that so the LLM only pays for what was
+actually said, and reports the token counts before and after.
+"""
+import re
+import html
+import unicodedata
+from typing import Any, Dict, List, Tuple
+
+Segments = List[Dict[str, Any]]
+
+# [Music], [Applause], (laughs) ... captions use brackets only for non-speech
+NON_SPEECH = re.compile(r"\[[^\]]*\]|\((?:music|applause|laughter|laughs|inaudible|silence|cheering)\)|♪+|>>", re.IGNORECASE)
+FILLER_WORDS = re.compile(r"\b(?:um+|uh+|erm+|uhm+|hmm+)\b[,.]?\s*", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*$")
+
+# Words of the previous text compared against the start of a segment
+OVERLAP_WINDOW = 30
+
+# Upper bound for a merged unit, since auto-captions often have no punctuation
+MAX_UNIT_CHARS = 400
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def normalize_text(text: str) -> str:
+    """Decode entities, drop non-speech markers and filler words, collapse whitespace."""
+    text = unicodedata.normalize("NFKC", html.unescape(text))
+    text = NON_SPEECH.sub(" ", text)
+    text = FILLER_WORDS.sub("", text)
+    return WHITESPACE.sub(" ", text).strip()
+
+
+def _strip_overlap(previous: List[str], words: List[str]) -> List[str]:
+    """Remove the longest prefix of `words` that repeats the end of `previous`."""
+    lowered = [word.lower() for word in words]
+    for size in range(min(len(previous), len(words)), 0, -1):
+        # A single repeated word is usually legitimate ("the the" aside)
+        if size < 2 and size < len(words):
+            break
+        if previous[-size:] == lowered[:size]:
+            return words[size:]
+    return words
+
+
+def merge_sentences(segments: Segments) -> Segments:
+    """
+    Merge consecutive segments into sentence-level units.
+
+    A unit ends at sentence punctuation or once it reaches MAX_UNIT_CHARS.
+    It starts when its first segment starts and lasts until its last
+    segment ends.
+    """
+    units: Segments = []
+    current: Segments = []
+    length = 0
+    for segment in segments:
+        current.append(segment)
+        length += len(segment["text"]) + 1
+        if SENTENCE_END.search(segment["text"]) or length >= MAX_UNIT_CHARS:
+            units.append(_merge(current))
+            current = []
+            length = 0
+    if current:
+        units.append(_merge(current))
+    return units
+
+
+def _merge(segments: Segments) -> Dict[str, Any]:
+    start = segments[0]["start"]
+    end = segments[-1]["start"] + segments[-1]["duration"]
+    return {
+        "text": " ".join(segment["text"] for segment in segments),
+        "start": start,
+        "duration": round(end - start, 3),
+    }
+
+
+def clean_segments(segments: Segments, sentences: bool = False) -> Tuple[Segments, Dict[str, int]]:
+    """
+    Clean transcript segments for summarization.
+
+    Args:
+        segments: Raw segments with text, start and duration
+        sentences: Also merge the segments into sentence-level units
+
+    Returns:
+        Tuple of (cleaned segments, counts of segments and estimated tokens
+        before and after)
+    """
+    cleaned: Segments = []
+    previous: List[str] = []
+    for segment in segments:
+        words = normalize_text(segment["text"]).split()
+        words = _strip_overlap(previous, words)
+        if not words:
+            continue
+        cleaned.append({"text": " ".join(words), "start": segment["start"], "duration": segment["duration"]})
+        previous = (previous + [word.lower() for word in words])[-OVERLAP_WINDOW:]
+
+    if sentences:
+        cleaned = merge_sentences(cleaned)
+
+    report = {
+        "segments_before": len(segments),
+        "segments_after": len(cleaned),
+        "tokens_before": estimate_tokens(" ".join(segment["text"] for segment in segments)),
+        "tokens_after": estimate_tokens(" ".join(segment["text"] for segment in cleaned)),
+    }
+    return cleaned, report
@@ -0,0 +1,215 @@
+"""
+Question answering over video transcripts.
+
+Instead of sending a whole transcript to the LLM, the cleaned transcript is
+split into short timestamped passages and indexed with BM25. A question
+only sends its best matching passages, a few hundred tokens, and the model
+cites their timestamps in the answer. Indexes are built off the event loop
+and cached per video, so follow-up questions about the same video only pay
+for the lookup and the LLM call.
+"""
+import os
+import math
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.cache import TTLCache
+from app.services.youtube_service import YouTubeService
+from app.services.llm_provider import LLMProvider
+from app.services.llm_router import LLMRouter
+from app.services.transcript_cleaner import Segments, clean_segments, estimate_tokens
+from app.services.extractive_summarizer import WORD, STOPWORDS
+from app.services.executor import run_blocking
+from app.services.singleflight import SingleFlight
+from app.services.registry import services
+
+logger = logging.getLogger(__name__)
+
+# Answer given without calling the LLM when no passage matches the question
+NO_MATCH_ANSWER = "The video does not seem to talk about this."
+
+
+def _terms(text: str) -> List[str]:
+    return [word for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def format_timestamp(seconds: float) -> str:
+    """Video position as m:ss, or h:mm:ss past the first hour."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over transcript passages.
+
+    Postings are stored per term as NumPy arrays of (passage, term frequency),
+    so scoring a question is a handful of vectorized additions.
+    """
+
+    def __init__(self, passages: Segments, k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            passages: Passages with text, start and duration, in order
+            k1: Term frequency saturation
+            b: Passage length normalization
+        """
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths = []
+        for index, passage in enumerate(passages):
+            counts = Counter(_terms(passage["text"]))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                ids, tfs = postings.setdefault(term, ([], []))
+                ids.append(index)
+                tfs.append(count)
+
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+        average = self.lengths.mean() if len(lengths) and self.lengths.mean() > 0 else 1.0
+        self.length_norm = k1 * (1 - b + b * self.lengths / average)
+        n = len(passages)
+        self.postings = {
+            term: (np.asarray(ids, dtype=np.int64), np.asarray(tfs, dtype=np.float64), math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5)))
+            for term, (ids, tfs) in postings.items()
+        }
+
+    def search(self, query: str, top_k: int = 4) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Find the passages that best match a query.
+
+        Args:
+            query: Free text query
+            top_k: Maximum number of passages to return
+
+        Returns:
+            List of (passage, score) with a positive score, best match first
+        """
+        scores = np.zeros(len(self.passages))
+        for term in set(_terms(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            ids, tfs, idf = posting
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + self.length_norm[ids])
+
+        matching = np.flatnonzero(scores > 0)
+        best = matching[np.argsort(-scores[matching], kind="stable")][:top_k]
+        return [(self.passages[i], float(scores[i])) for i in best]
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+
+class TranscriptQAService:
+    """
+    Answers questions about YouTube videos from their transcripts.
+
+    Settings:
+    - QA_TOP_K: passages sent to the LLM by default (4)
+    - QA_INDEX_CACHE_SIZE / QA_INDEX_TTL: indexes kept in memory and for how
+      many seconds (64, 3600)
+    """
+
+    def __init__(self, youtube: Optional[YouTubeService] = None, llm: Optional[LLMProvider] = None):
+        self.youtube = youtube or services.get(YouTubeService)
+        self.llm = llm or services.get(LLMRouter)
+        self.top_k = int(os.getenv("QA_TOP_K", 4))
+        self.indexes = TTLCache(
+            max_entries=int(os.getenv("QA_INDEX_CACHE_SIZE", 64)),
+            ttl=float(os.getenv("QA_INDEX_TTL", 3600))
+        )
+        # Concurrent questions about one video share its index build
+        self.index_loads = SingleFlight("qa_index")
+        self.questions = 0
+        self.index_builds = 0
+        self.unanswered = 0
+        self.transcript_tokens = 0
+        self.prompt_tokens = 0
+
+    async def get_index(self, video_id: str) -> BM25Index:
+        """
+        BM25 index of a video's transcript, built on first use.
+
+        Raises:
+            Exception: If the transcript cannot be fetched
+        """
+        index = self.indexes.get(video_id)
+        if index is not None:
+            return index
+
+        return await self.index_loads.do(video_id, lambda: self._build_index(video_id))
+
+    async def _build_index(self, video_id: str) -> BM25Index:
+        _, segments = await self.youtube.get_transcript(video_id)
+        index = await run_blocking("summarizer", self._index_segments, segments)
+        self.index_builds += 1
+        self.indexes.set(video_id, index)
+        return index
+
+    def _index_segments(self, segments: Segments) -> BM25Index:
+        # Sentence-level units of at most a few hundred characters, with their timestamps
+        passages, _ = clean_segments(segments, sentences=True)
+        return BM25Index(passages)
+
+    async def ask(self, video_id: str, question: str, top_k: Optional[int] = None) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Answer a question about a video.
+
+        Args:
+            video_id: YouTube video ID
+            question: The user's question
+            top_k: Number of passages to send to the LLM (QA_TOP_K by default)
+
+        Returns:
+            Tuple of (answer, passages used, in video order, each with text,
+            start, duration, timestamp and score)
+
+        Raises:
+            Exception: If the transcript cannot be fetched or the model call fails
+        """
+        self.questions += 1
+        index = await self.get_index(video_id)
+        matches = index.search(question, top_k or self.top_k)
+        if not matches:
+            self.unanswered += 1
+            return NO_MATCH_ANSWER, []
+
+        # Chronological order reads more naturally for the model and the user
+        matches.sort(key=lambda match: match[0]["start"])
+        passages = [
+            {
+                "text": passage["text"],
+                "start": passage["start"],
+                "duration": passage["duration"],
+                "timestamp": format_timestamp(passage["start"]),
+                "score": round(score, 3),
+            }
+            for passage, score in matches
+        ]
+        excerpts = [f"[{passage['timestamp']}] {passage['text']}" for passage in passages]
+
+        self.transcript_tokens += sum(estimate_tokens(passage["text"]) for passage in index.passages)
+        self.prompt_tokens += estimate_tokens("\n".join(excerpts) + question)
+        answer = await self.llm.answer_question(question, excerpts)
+        return answer, passages
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "questions": self.questions,
+            "unanswered": self.unanswered,
+            "index_builds": self.index_builds,
+            "transcript_tokens": self.transcript_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "indexes": self.indexes.stats(),
+        }
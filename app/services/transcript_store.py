@@ -0,0 +1,177 @@
+"""
+Persistent transcript cache keyed by YouTube video ID and language.
+
+A transcript never changes once published, so it only needs to be fetched
+from YouTube once. Raw segments are stored gzip-compressed in a local
+SQLite file with a small in-memory LRU in front. The store tracks the total
+compressed size on disk and evicts the least recently used transcripts
+once it goes over its byte budget.
+"""
+import os
+import gzip
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.services.cache import TTLCache, connect_sqlite, data_path
+from app.services.executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+Segments = List[Dict[str, Any]]
+
+# Only refresh a row's access time when it is older than this, to avoid a
+# disk write on every hit
+TOUCH_INTERVAL = 3600
+
+
+class TranscriptStore:
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None, memory_entries: Optional[int] = None):
+        """
+        Args:
+            path: SQLite file path (defaults to the data directory)
+            max_bytes: Budget for compressed transcripts on disk
+            memory_entries: Transcripts kept decompressed in memory
+        """
+        self.path = path or data_path("transcripts.sqlite3")
+        self.max_bytes = max_bytes or int(os.getenv("TRANSCRIPT_STORE_MAX_BYTES", 200 * 1024 * 1024))
+        self.memory = TTLCache(max_entries=memory_entries or int(os.getenv("TRANSCRIPT_MEMORY_ENTRIES", 64)))
+        self.enabled = True
+        self.total_bytes = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None or not self.enabled:
+            return self._conn
+        conn = connect_sqlite(self.path, [
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            "video_id TEXT NOT NULL, language TEXT NOT NULL, data BLOB NOT NULL, "
+            "size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+            "PRIMARY KEY (video_id, language))",
+            "CREATE INDEX IF NOT EXISTS transcripts_accessed ON transcripts (accessed_at)",
+        ], "transcript store")
+        if conn is None:
+            self.enabled = False
+            return None
+        try:
+            self.total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Disabling transcript store {self.path}: {str(e)}")
+            conn.close()
+            self.enabled = False
+            return None
+        self._conn = conn
+        return self._conn
+
+    async def get(self, video_id: str, languages: Sequence[str]) -> Optional[Tuple[str, Segments]]:
+        """
+        Find a stored transcript in the first available language.
+
+        Args:
+            video_id: YouTube video ID
+            languages: Language codes in order of preference
+
+        Returns:
+            Tuple of (language code, segments) or None when not stored
+        """
+        for language in languages:
+            segments = self.memory.get((video_id, language))
+            if segments is not None:
+                return language, segments
+
+        found = await run_blocking("storage", self._load, video_id, languages)
+        if found is not None:
+            self.disk_hits += 1
+            self.memory.set((video_id, found[0]), found[1])
+        return found
+
+    async def put(self, video_id: str, language: str, segments: Segments) -> None:
+        """Store a transcript in memory and on disk."""
+        self.memory.set((video_id, language), segments)
+        await run_blocking("storage", self._save, video_id, language, segments)
+
+    def _load(self, video_id: str, languages: Sequence[str]) -> Optional[Tuple[str, Segments]]:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                for language in languages:
+                    row = conn.execute(
+                        "SELECT data, accessed_at FROM transcripts WHERE video_id = ? AND language = ?",
+                        (video_id, language)
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    data, accessed_at = row
+                    now = time.time()
+                    if now - accessed_at > TOUCH_INTERVAL:
+                        conn.execute(
+                            "UPDATE transcripts SET accessed_at = ? WHERE video_id = ? AND language = ?",
+                            (now, video_id, language)
+                        )
+                        conn.commit()
+                    return language, json.loads(gzip.decompress(data))
+            except (sqlite3.Error, OSError, ValueError) as e:
+                logger.warning(f"Transcript store read failed for {video_id}: {str(e)}")
+        return None
+
+    def _save(self, video_id: str, language: str, segments: Segments) -> None:
+        data = gzip.compress(json.dumps(segments, separators=(",", ":")).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                row = conn.execute(
+                    "SELECT size FROM transcripts WHERE video_id = ? AND language = ?", (video_id, language)
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO transcripts (video_id, language, data, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (video_id, language, data, len(data), now, now)
+                )
+                self.total_bytes += len(data) - (row[0] if row else 0)
+                self._evict(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Transcript store write failed for {video_id}: {str(e)}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop least recently used transcripts until the store fits its byte budget."""
+        while self.total_bytes > self.max_bytes:
+            rows = conn.execute(
+                "SELECT video_id, language, size FROM transcripts ORDER BY accessed_at LIMIT 32"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                return
+            for video_id, language, size in rows:
+                if self.total_bytes <= self.max_bytes:
+                    return
+                conn.execute("DELETE FROM transcripts WHERE video_id = ? AND language = ?", (video_id, language))
+                self.memory.delete((video_id, language))
+                self.total_bytes -= size
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.stats(),
+            "disk_hits": self.disk_hits,
+            "disk_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,22 +1,41 @@
 import os
-import httpx
-from typing import Dict, Any, Tuple
-from opencage.geocoder import OpenCageGeocode
+import time
+from typing import Dict, Any, Tuple, Optional
 import logging
 import traceback
+from app.services.http_client import HTTPClientManager, http_clients as default_http_clients
+from app.services.geocoding_service import GeocodingService
+from app.services.registry import services
+from app.services.cache import TTLCache
+from app.services.geo import geohash_encode
+from app.services.singleflight import SingleFlight
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class WeatherService:
-    def __init__(self):
+    def __init__(self, http_clients: Optional[HTTPClientManager] = None, geocoding: Optional[GeocodingService] = None):
+        self.http_clients = http_clients or default_http_clients
         self.weather_api_key = os.getenv("OPENWEATHER_API_KEY")
-        self.geocoder = OpenCageGeocode(os.getenv("OPENCAGE_API_KEY"))
+        # Cached geocoding shared with the EV station service
+        self.geocoding = geocoding or services.get(GeocodingService)
+        
+        # Weather cache keyed by geohash cell. Entries younger than fresh_ttl are
+        # served as-is; older ones (up to stale_ttl) are served immediately while
+        # one background refresh per cell fetches a new reading.
+        self.geohash_precision = int(os.getenv("WEATHER_GEOHASH_PRECISION", 5))
+        self.fresh_ttl = float(os.getenv("WEATHER_CACHE_TTL", 600))
+        self.stale_ttl = float(os.getenv("WEATHER_STALE_TTL", 3600))
+        self.cache = TTLCache(max_entries=int(os.getenv("WEATHER_CACHE_SIZE", 4096)), ttl=self.stale_ttl)
+        self.refreshes = SingleFlight("weather")
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
         
         # Log API key status for debugging (don't log actual keys)
         logger.info(f"Weather API key configured: {bool(self.weather_api_key)}")
-        logger.info(f"Geocoder API key configured: {bool(self.geocoder.key)}")
+        logger.info(f"Geocoder API key configured: {bool(self.geocoding.geocoder.key)}")
         
     async def geocode_location(self, location: str) -> Tuple[Dict[str, float], str]:
         """
@@ -33,20 +52,7 @@ class WeatherService:
         """
         try:
             logger.info(f"Geocoding location: {location}")
-            results = self.geocoder.geocode(location)
-            
-            if not results or len(results) == 0:
-                logger.error(f"No geocoding results found for: {location}")
-                raise Exception(f"Could not geocode location: {location}")
-                
-            top_result = results[0]
-            coords = {
-                "lat": top_result["geometry"]["lat"],
-                "lng": top_result["geometry"]["lng"]
-            }
-            
-            # Get formatted location name
-            formatted_location = top_result.get("formatted", location)
+            coords, formatted_location = await self.geocoding.geocode(location)
             logger.info(f"Successfully geocoded {location} to {coords} ({formatted_location})")
             
             return coords, formatted_location
@@ -58,7 +64,7 @@ class WeatherService:
     
     async def get_weather(self, lat: float, lng: float) -> Dict[str, Any]:
         """
-        Get current weather for coordinates.
+        Get current weather for coordinates, answering from the cache when possible.
         
         Args:
             lat: Latitude
@@ -70,34 +76,83 @@ class WeatherService:
         Raises:
             Exception: If weather retrieval fails
         """
-        url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lng}&appid={self.weather_api_key}&units=metric"
+        cell = geohash_encode(lat, lng, self.geohash_precision)
+        entry = self.cache.get(cell)
+        
+        if entry is not None:
+            if time.time() - entry["fetched_at"] < self.fresh_ttl:
+                self.fresh_hits += 1
+            else:
+                # Serve the stale reading now and revalidate in the background
+                self.stale_hits += 1
+                self.refreshes.launch(cell, lambda: self._fetch_and_store(cell, lat, lng))
+            return dict(entry["data"])
+        
+        # Nothing usable cached: wait for the cell's (possibly shared) refresh
+        self.misses += 1
+        data = await self.refreshes.do(cell, lambda: self._fetch_and_store(cell, lat, lng))
+        return dict(data)
+    
+    async def _fetch_and_store(self, cell: str, lat: float, lng: float) -> Dict[str, Any]:
+        data = await self._fetch_weather(lat, lng)
+        self.cache.set(cell, {"data": data, "fetched_at": time.time()})
+        return data
+    
+    async def _fetch_weather(self, lat: float, lng: float) -> Dict[str, Any]:
+        """
+        Fetch current weather for coordinates from OpenWeather.
+        
+        Args:
+            lat: Latitude
+            lng: Longitude
+            
+        Returns:
+            Weather data dictionary
+            
+        Raises:
+            Exception: If weather retrieval fails
+        """
+        params = {
+            "lat": lat,
+            "lon": lng,
+            "appid": self.weather_api_key,
+            "units": "metric"
+        }
         
         try:
             logger.info(f"Fetching weather data for coordinates: {lat}, {lng}")
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url)
-                
-                if response.status_code != 200:
-                    error_msg = f"Weather API error: {response.status_code} - {response.text}"
-                    logger.error(error_msg)
-                    raise Exception(error_msg)
-                    
-                data = response.json()
-                logger.info(f"Successfully retrieved weather data for {lat}, {lng}")
-                
-                # Extract relevant weather information
-                weather_data = {
-                    "temperature": data["main"]["temp"],
-                    "temperature_fahrenheit": (data["main"]["temp"] * 9/5) + 32,
-                    "conditions": data["weather"][0]["main"],
-                    "humidity": data["main"]["humidity"],
-                    "wind_speed": data["wind"]["speed"],
-                    "location": data["name"]
-                }
-                
-                return weather_data
+            client = self.http_clients.get("openweather")
+            response = await client.get("/data/2.5/weather", params=params)
+            
+            if response.status_code != 200:
+                error_msg = f"Weather API error: {response.status_code} - {response.text}"
+                logger.error(error_msg)
+                raise Exception(error_msg)
                 
+            data = response.json()
+            logger.info(f"Successfully retrieved weather data for {lat}, {lng}")
+            
+            # Extract relevant weather information
+            weather_data = {
+                "temperature": data["main"]["temp"],
+                "temperature_fahrenheit": (data["main"]["temp"] * 9/5) + 32,
+                "conditions": data["weather"][0]["main"],
+                "humidity": data["main"]["humidity"],
+                "wind_speed": data["wind"]["speed"],
+                "location": data["name"]
+            }
+            
+            return weather_data
+            
         except Exception as e:
             error_msg = f"Weather retrieval error: {str(e)}"
             logger.error(f"{error_msg}\n{traceback.format_exc()}")
-            raise Exception(error_msg) 
\ No newline at end of file
+            raise Exception(error_msg)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached_cells": len(self.cache),
+            "fresh_hits": self.fresh_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
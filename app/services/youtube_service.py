@@ -1,12 +1,31 @@
+import os
 import re
-from typing import Tuple, List, Dict, Any
+import html
+from typing import Tuple, List, Dict, Any, Optional
 from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled
-import httpx
-from bs4 import BeautifulSoup
+from app.services.http_client import HTTPClientManager, http_clients as default_http_clients
+from app.services.cache import TTLCache
+from app.services.executor import run_blocking
+from app.services.transcript_store import TranscriptStore
+from app.services.registry import services
+
+# Transcript languages in order of preference
+TRANSCRIPT_LANGUAGES = ['en', 'en-US', 'en-GB']
+
+# Stop reading a watch page after this many bytes when looking for its <title>
+TITLE_SCAN_BYTES = 512 * 1024
+
+TITLE_PATTERN = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
 
 class YouTubeService:
-    def __init__(self):
-        pass
+    def __init__(self, http_clients: Optional[HTTPClientManager] = None, transcripts: Optional[TranscriptStore] = None):
+        self.http_clients = http_clients or default_http_clients
+        # Transcripts never change, so each one is fetched from YouTube only once
+        self.transcripts = transcripts or services.get(TranscriptStore)
+        self.titles = TTLCache(
+            max_entries=int(os.getenv("YOUTUBE_TITLE_CACHE_SIZE", 2048)),
+            ttl=float(os.getenv("YOUTUBE_TITLE_TTL", 24 * 3600))
+        )
         
     async def extract_video_id(self, url: str) -> str:
         """
@@ -38,28 +57,63 @@ class YouTubeService:
         """
         Get the title of a YouTube video.
         
+        Uses the small oEmbed JSON document, falling back to reading the watch
+        page only up to its `</title>`. Titles are cached by video ID.
+        
         Args:
             video_id: YouTube video ID
             
         Returns:
             Video title
         """
+        title = self.titles.get(video_id)
+        if title is not None:
+            return title
+        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"https://www.youtube.com/watch?v={video_id}")
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    title_tag = soup.find('title')
-                    if title_tag:
-                        # Remove " - YouTube" from the title
-                        title = title_tag.text.replace(' - YouTube', '')
-                        return title
-                        
-            # Fallback
-            return f"YouTube Video {video_id}"
+            title = await self._fetch_oembed_title(video_id) or await self._fetch_page_title(video_id)
         except Exception as e:
             print(f"Error fetching video title: {str(e)}")
+            title = None
+        
+        if not title:
+            # Fallback, not cached so the next request tries again
             return f"YouTube Video {video_id}"
+        self.titles.set(video_id, title)
+        return title
+    
+    async def _fetch_oembed_title(self, video_id: str) -> Optional[str]:
+        """Title from the oEmbed endpoint, or None when it is unavailable."""
+        client = self.http_clients.get("youtube")
+        response = await client.get(
+            "/oembed",
+            params={"url": f"https://www.youtube.com/watch?v={video_id}", "format": "json"}
+        )
+        if response.status_code != 200:
+            # oEmbed answers 401/403 for videos that cannot be embedded
+            return None
+        return response.json().get("title")
+    
+    async def _fetch_page_title(self, video_id: str) -> Optional[str]:
+        """Title from the watch page, reading only until `</title>`."""
+        client = self.http_clients.get("youtube")
+        async with client.stream("GET", "/watch", params={"v": video_id}) as response:
+            if response.status_code != 200:
+                return None
+            head = ""
+            async for text in response.aiter_text():
+                # Only look again once a closing tag may have arrived
+                scan_from = max(0, len(head) - len("</title>"))
+                head += text
+                if "</title>" in head[scan_from:].lower():
+                    match = TITLE_PATTERN.search(head)
+                    if match:
+                        # Remove " - YouTube" from the title
+                        title = html.unescape(match.group(1)).strip()
+                        return title.replace(' - YouTube', '') or None
+                if len(head) > TITLE_SCAN_BYTES:
+                    break
+        return None
     
     async def get_transcript(self, video_id: str) -> Tuple[str, List[Dict[str, Any]]]:
         """
@@ -75,16 +129,13 @@ class YouTubeService:
             Exception: If there's an error fetching the transcript
         """
         try:
-            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-            
-            # Try to get English transcript first
-            try:
-                transcript = transcript_list.find_transcript(['en'])
-            except:
-                # If English not available, get the first available transcript
-                transcript = transcript_list.find_transcript(['en-US', 'en-GB'])
-                
-            transcript_data = transcript.fetch()
+            stored = await self.transcripts.get(video_id, TRANSCRIPT_LANGUAGES)
+            if stored is not None:
+                _, transcript_data = stored
+            else:
+                # The transcript API is blocking, run it off the event loop
+                language, transcript_data = await run_blocking("youtube", self._fetch_transcript, video_id)
+                await self.transcripts.put(video_id, language, transcript_data)
             
             # Combine text from transcript segments
             full_text = " ".join([segment['text'] for segment in transcript_data])
@@ -96,4 +147,32 @@ class YouTubeService:
         except TranscriptsDisabled:
             raise Exception("Transcripts are disabled for this video.")
         except Exception as e:
-            raise Exception(f"Error fetching transcript: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Error fetching transcript: {str(e)}")
+    
+    def _fetch_transcript(self, video_id: str) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Fetch the raw transcript segments (blocking).
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            Tuple of (language code, list of segments with text, start and duration)
+        """
+        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+        
+        # Try to get English transcript first
+        try:
+            transcript = transcript_list.find_transcript(['en'])
+        except:
+            # If English not available, get the first available transcript
+            transcript = transcript_list.find_transcript(TRANSCRIPT_LANGUAGES[1:])
+            
+        segments = [
+            {"text": segment["text"], "start": segment["start"], "duration": segment["duration"]}
+            for segment in transcript.fetch()
+        ]
+        return transcript.language_code, segments
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"titles": self.titles.stats()}
@@ -12,16 +12,14 @@ setup(
         "uvicorn>=0.22.0",
         "pydantic>=2.0.2",
         "python-dotenv>=1.0.0",
-        "httpx>=0.24.1",
+        "httpx[http2]>=0.24.1",
         "python-multipart>=0.0.6",
-        "requests>=2.31.0",
         "jinja2>=3.1.2",
         "youtube-transcript-api>=0.6.1",
-        "openai>=0.27.8",
         "groq>=0.3.0",
         "serper-dev>=0.1.4",
         "opencage>=2.3.0",
-        "beautifulsoup4>=4.12.2",
-        "alpaca-trade-api>=3.0.0",
+        "numpy>=1.24.0",
+        "Pillow>=11.0.0",
     ],
 ) 
\ No newline at end of file